@@ -0,0 +1,108 @@
+'''
+Compare short transactions with BEGIN sent in its own round trip and
+pipelined with the first statement.
+
+Connection settings are taken from the same EGRESS_TESTDB_* environment
+variables as the test suite. The connection goes through a proxy which
+delays everything it forwards by half of latency_ms each way, as a network
+would, and counts the flushes the client sends to the server.
+
+    python -m benchmarks.begin [transactions] [latency_ms]
+'''
+import socket
+import sys
+import threading
+import time
+
+import egress as db
+from egress import libpq
+from egress.tests.config import DATABASE
+
+
+class LatencyProxy(object):
+    '''
+    Forward TCP connections to the server, delaying each chunk of data.
+    '''
+    def __init__(self, address, family, delay):
+        self.address = address
+        self.family = family
+        self.delay = delay
+        self.flushes = 0
+        self.listener = socket.socket()
+        self.listener.bind(('127.0.0.1', 0))
+        self.listener.listen()
+        self.port = self.listener.getsockname()[1]
+        threading.Thread(target=self.accept, daemon=True).start()
+
+    def accept(self):
+        while True:
+            client, _ = self.listener.accept()
+            client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            server = socket.socket(self.family)
+            server.connect(self.address)
+            if self.family != socket.AF_UNIX:
+                server.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            threading.Thread(target=self.forward, args=(client, server, True), daemon=True).start()
+            threading.Thread(target=self.forward, args=(server, client, False), daemon=True).start()
+
+    def forward(self, source, dest, count):
+        while True:
+            try:
+                data = source.recv(65536)
+            except OSError:
+                data = b''
+            if not data:
+                dest.close()
+                return
+            if count:
+                self.flushes += 1
+            time.sleep(self.delay)
+            dest.sendall(data)
+
+
+def server_address():
+    host = DATABASE.get('host') or '/var/run/postgresql'
+    port = int(DATABASE.get('port') or 5432)
+    if host.startswith('/'):
+        return ('%s/.s.PGSQL.%d' % (host, port)), socket.AF_UNIX
+    return (host, port), socket.AF_INET
+
+
+def run(connection, proxy, ntxns, repeat=3):
+    best = None
+    with connection.cursor() as cursor:
+        for _ in range(repeat):
+            flushes = proxy.flushes
+            start = time.perf_counter()
+            for i in range(ntxns):
+                cursor.execute('SELECT %s::int4', [i])
+                cursor.fetchall()
+                connection.commit()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+            flushes = proxy.flushes - flushes
+    return ntxns / best, flushes / ntxns
+
+
+def main(ntxns=500, latency_ms=1.0):
+    address, family = server_address()
+    proxy = LatencyProxy(address, family, latency_ms / 2000.0)
+    settings = dict(DATABASE, host='127.0.0.1', port=str(proxy.port))
+    connection = db.connect(**settings)
+    has_pipeline = libpq.HAS_PIPELINE
+    print('latency %.2fms' % latency_ms)
+    try:
+        for label, pipeline in (
+            ('separate', False),
+            ('pipelined', True),
+        ):
+            libpq.HAS_PIPELINE = has_pipeline and pipeline
+            rate, flushes = run(connection, proxy, ntxns)
+            print('%-10s %12.0f txns/sec %6.1f flushes/txn' % (label, rate, flushes))
+    finally:
+        libpq.HAS_PIPELINE = has_pipeline
+    connection.close()
+
+
+if __name__ == '__main__':
+    main(*[cast(arg) for cast, arg in zip((int, float), sys.argv[1:])])
@@ -0,0 +1,62 @@
+'''
+Compare row-at-a-time and column-at-a-time fetching.
+
+Connection settings are taken from the same EGRESS_TESTDB_* environment
+variables as the test suite.
+
+    python -m benchmarks.fetch [rows]
+'''
+import sys
+import time
+
+import egress as db
+from egress.tests.config import DATABASE
+
+QUERY = '''
+SELECT (i % 30000)::int2, i::int4, i::int8, i::float4, i::float8, i % 2 = 0,
+       '2000-01-01'::date + i % 1000,
+       '2000-01-01'::timestamp + i * interval '1 second'
+  FROM generate_series(1, {}) i
+'''
+
+
+def fetch_by_row(cursor):
+    rows = []
+    while True:
+        row = cursor.fetchone()
+        if row is None:
+            break
+        rows.append(row)
+    return rows
+
+
+def fetch_by_column(cursor):
+    return cursor.fetchall()
+
+
+def run(cursor, fetch, nrows, repeat=5):
+    best = None
+    for _ in range(repeat):
+        cursor.execute(QUERY.format(nrows))
+        start = time.perf_counter()
+        rows = fetch(cursor)
+        elapsed = time.perf_counter() - start
+        assert len(rows) == nrows
+        best = elapsed if best is None else min(best, elapsed)
+    return nrows / best
+
+
+def main(nrows=100000):
+    connection = db.connect(**DATABASE)
+    connection._autocommit = True
+    with connection.cursor() as cursor:
+        for label, fetch in (
+            ('fetchone', fetch_by_row),
+            ('fetchall', fetch_by_column),
+        ):
+            print('%-10s %12.0f rows/sec' % (label, run(cursor, fetch, nrows)))
+    connection.close()
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,98 @@
+'''
+Compare the numeric codec with the string building implementation it
+replaced.
+
+    python -m benchmarks.numeric [values]
+'''
+import random
+import struct
+import sys
+import time
+
+from decimal import Decimal
+from itertools import repeat
+
+from egress.types import NumericType
+
+
+def old_parse(value, size, tzinfo):
+    hsize = struct.calcsize('!HhHH')
+    ndigits, weight, sign, dscale = struct.unpack('!HhHH', value[:hsize])
+    if sign == 0xc000:
+        return Decimal('NaN')
+    desc = '!%dH' % ndigits
+    digits = struct.unpack(desc, value[hsize:hsize+struct.calcsize(desc)])
+
+    def source(digits):
+        for d in digits:
+            dd = '{:04d}'.format(d)
+            yield from dd
+        yield from repeat('0')
+
+    src = source(digits)
+
+    n = '-' if sign else ''
+    for _ in range((weight+1) * 4):
+        n = n + next(src)
+    if dscale:
+        n += '.'
+        for _ in range(dscale):
+            n = n + next(src)
+    n = Decimal(n)
+    return n
+
+
+def old_format(value):
+    sign, digits, exponent = value.as_tuple()
+    dscale = abs(exponent)
+    if exponent:
+        frac = digits[exponent:]
+        digits = digits[:exponent]
+    else:
+        frac = []
+    vals = []
+    while digits:
+        vals.append(int(''.join(map(str, digits[:4]))))
+        digits = digits[4:]
+    weight = len(vals)
+    while frac:
+        d = (frac[:4] + ('0',) * 4)[:4]
+        frac = frac[4:]
+        vals.append(int(''.join(map(str, d))))
+    fmt = '!HhHH%dH' % len(vals)
+    size = struct.calcsize(fmt)
+    val = struct.pack(fmt, len(vals), max(0, weight-1), 0x4000 if sign else 0, dscale, *vals)
+    return (1700, val, size)
+
+
+def best(func, values, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for value in values:
+            func(*value)
+        timings.append(time.perf_counter() - start)
+    return len(values) / min(timings)
+
+
+def main(nvalues=100000):
+    rng = random.Random(0)
+    # Prices: up to 10 digits with 2 decimal places
+    values = [
+        Decimal(rng.randrange(-10 ** 10, 10 ** 10)).scaleb(-2)
+        for _ in range(nvalues)
+    ]
+    encoded = [NumericType.format(value)[1:] + (None,) for value in values]
+    values = [(value,) for value in values]
+
+    for label, func, args in (
+        ('old parse', old_parse, encoded),
+        ('new parse', NumericType.parse, encoded),
+        ('old format', old_format, values),
+        ('new format', NumericType.format, values),
+    ):
+        print('%-12s %12.0f values/sec' % (label, best(func, args)))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
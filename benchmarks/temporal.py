@@ -0,0 +1,74 @@
+'''
+Compare the date and timestamp codecs with the implementations they
+replaced, and time fetching a time series.
+
+Connection settings for the fetch are taken from the same EGRESS_TESTDB_*
+environment variables as the test suite.
+
+    python -m benchmarks.temporal [values]
+'''
+import datetime
+import random
+import sys
+import time
+
+import egress as db
+from egress.tests.config import DATABASE
+from egress.types import DateType, TimestampTzType
+
+QUERY = '''
+SELECT '2020-01-01'::timestamptz + i * interval '1 second', i::float8
+  FROM generate_series(1, {}) i
+'''
+
+
+def old_parse_timestamptz(values, tzinfo):
+    epoch = datetime.datetime(2000, 1, 1, tzinfo=tzinfo)
+    timedelta = datetime.timedelta
+    return [epoch + timedelta(microseconds=val) for val in values]
+
+
+def old_parse_date(values, tzinfo):
+    epoch = datetime.date(2000, 1, 1)
+    timedelta = datetime.timedelta
+    return [epoch + timedelta(days=val) for val in values]
+
+
+def best(func, args, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(nvalues=100000):
+    rng = random.Random(0)
+    utc = datetime.timezone.utc
+    micros = [rng.randrange(0, 30 * 365 * 86400 * 10 ** 6) for _ in range(nvalues)]
+    days = [rng.randrange(-3650, 3650) for _ in range(nvalues)]
+
+    for label, func, args in (
+        ('old timestamptz', old_parse_timestamptz, (micros, utc)),
+        ('new timestamptz', TimestampTzType.convert_many, (micros, utc)),
+        ('old date', old_parse_date, (days, None)),
+        ('new date', DateType.convert_many, (days, None)),
+    ):
+        print('%-16s %12.0f values/sec' % (label, nvalues / best(func, args)))
+
+    connection = db.connect(**DATABASE)
+    connection._autocommit = True
+    with connection.cursor() as cursor:
+        cursor.tzinfo = utc
+
+        def fetch():
+            cursor.execute(QUERY.format(nvalues))
+            return cursor.fetchall()
+
+        print('%-16s %12.0f rows/sec' % ('fetchall', nvalues / best(fetch, ())))
+    connection.close()
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
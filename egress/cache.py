@@ -0,0 +1,106 @@
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    '''
+    A bounded mapping which discards the least recently used entries, and
+    counts its hits and misses.
+    '''
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        '''
+        Store a value, returning a list of the (key, value) pairs evicted to
+        make room for it.
+        '''
+        self._data[key] = value
+        self._data.move_to_end(key)
+        evicted = []
+        while len(self._data) > max(self.maxsize, 0):
+            evicted.append(self._data.popitem(last=False))
+        return evicted
+
+    def pop(self, key, default=None):
+        return self._data.pop(key, default)
+
+    def clear(self):
+        self._data.clear()
+
+    def items(self):
+        return list(self._data.items())
+
+
+class TextDictionary(object):
+    '''
+    Decodes a text column, sharing one str between the cells holding the same
+    bytes, so columns with few distinct values hold few strings.
+
+    At most maxsize values are kept. Once sample values have been decoded,
+    if fewer than min_hit_rate of them were found in the dictionary, it is
+    bypassed from then on, as the column has too many distinct values to
+    gain from it.
+    '''
+    sample = 1000
+    min_hit_rate = 0.5
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.bypass = False
+        self._values = {}
+
+    def decode_column(self, values):
+        '''
+        Decode a column of raw values, as returned by Result.get_column.
+        '''
+        if self.bypass:
+            return [None if raw is None else raw.decode('utf-8') for raw in values]
+
+        cache = self._values
+        get = cache.get
+        room = self.maxsize - len(cache)
+        misses = nulls = 0
+        column = []
+        append = column.append
+        for raw in values:
+            if raw is None:
+                append(None)
+                nulls += 1
+                continue
+            text = get(raw)
+            if text is None:
+                text = raw.decode('utf-8')
+                misses += 1
+                if room > 0:
+                    cache[raw] = text
+                    room -= 1
+            append(text)
+
+        self.misses += misses
+        self.hits += len(column) - misses - nulls
+        total = self.hits + self.misses
+        if total >= self.sample and self.hits < total * self.min_hit_rate:
+            self.bypass = True
+            cache.clear()
+        return column
@@ -1,7 +1,10 @@
+import itertools
 import logging
 
 from . import libpq, exceptions
-from .cursor import Cursor
+from .cache import LRUCache
+from .cursor import Cursor, NamedCursor
+from .registry import get_registry
 
 
 log = logging.getLogger(__name__)
@@ -79,6 +82,11 @@ EXC_MAP = {
 }
 
 
+# Commands after which prepared statements and result descriptions may no
+# longer be valid, because the tables they use have changed
+SCHEMA_COMMANDS = {'CREATE', 'ALTER', 'DROP', 'DISCARD'}
+
+
 def requires_open(func):
     def _wrapper(self, *args, **kwargs):
         if not self.conn:
@@ -88,6 +96,22 @@ def requires_open(func):
 
 
 class Connection(object):
+    # Number of result descriptions to remember, keyed by query and column
+    # types.
+    description_cache_size = 128
+
+    # Number of times a statement must be executed before it is prepared, or
+    # None to never prepare statements. Off by default, as prepared statements
+    # do not survive a transaction pooler such as PgBouncer moving the
+    # session to another server connection.
+    prepare_threshold = None
+    # Number of prepared statements to keep; the least recently used are
+    # deallocated.
+    statement_cache_size = 100
+    # A JSON file to remember the types of each database in, so new processes
+    # need not look them up.
+    type_cache_path = None
+
     def __init__(self, conn, **kwargs):
         self.conn = conn
         self.kwargs = kwargs
@@ -96,6 +120,18 @@ class Connection(object):
         self._autocommit = False
         self.pid = self.conn.pid()
         self.tzinfo = None
+        self.description_cache = LRUCache(self.description_cache_size)
+        self._stream = None
+        self.statement_cache = LRUCache(self.statement_cache_size)
+        self._statement_counts = LRUCache(self.statement_cache_size)
+        self._statement_ids = itertools.count(1)
+        # Prepared statements to deallocate once the failed transaction they
+        # were dropped in has ended
+        self._deallocations = []
+        self.type_registry = get_registry(
+            '%s:%s/%s' % (self.conn.host(), self.conn.port(), self.conn.db()),
+            self.type_cache_path,
+        )
 
     @property
     @requires_open
@@ -116,6 +152,7 @@ class Connection(object):
         while self.cursors:
             self.cursors[0].close()
 
+        self._end_stream()
         if self._in_txn:
             self.rollback()
 
@@ -134,9 +171,11 @@ class Connection(object):
         Database modules that do not support transactions should implement this
         method with void functionality.
         '''
+        self._end_stream()
         if self._in_txn:
             res = self.conn.execute('COMMIT')
             res.check_cmd_result()
+            self._deallocate()
 
     @requires_open
     def rollback(self):
@@ -149,22 +188,157 @@ class Connection(object):
         a connection without committing the changes first will cause an
         implicit rollback to be performed.
         '''
+        self._end_stream()
         if self._in_txn:
             res = self.conn.execute('ROLLBACK')
             res.check_cmd_result()
+            self._deallocate()
 
-    def cursor(self):
+    def cursor(self, name=None, withhold=False):
         '''
         Return a new Cursor Object using the connection.
 
         If the database does not provide a direct cursor concept, the module
         will have to emulate cursors using other means to the extent needed by
         this specification.
+
+        If a name is given, a server side cursor is returned, which fetches
+        its rows in batches as they are consumed. withhold allows it to be
+        used outside of the transaction it was created in.
         '''
-        cursor = Cursor(self)
+        if name is None:
+            cursor = Cursor(self)
+        else:
+            cursor = NamedCursor(self, name, withhold)
         self.cursors.append(cursor)
         return cursor
 
+    def _prepared_statement(self, operation, nparams, param_types, begin=False):
+        '''
+        Return the name of the prepared statement for operation with these
+        parameter types, or None if it has not been run often enough yet.
+
+        Once an operation has been seen prepare_threshold times it is
+        prepared; the least recently used statements are deallocated to keep
+        statement_cache within its size. If begin is set, a transaction is
+        started before preparing, so errors leave it in the same state as
+        executing the operation would.
+        '''
+        if self.prepare_threshold is None:
+            return None
+
+        key = (operation, tuple(param_types) if param_types else ())
+        name = self.statement_cache.get(key)
+        if name is not None:
+            return name
+
+        count = self._statement_counts.get(key, 0) + 1
+        if count < self.prepare_threshold:
+            self._statement_counts.put(key, count)
+            return None
+        self._statement_counts.pop(key)
+
+        if begin:
+            self.conn.execute('BEGIN').check_cmd_result()
+        name = '_egress_%d' % next(self._statement_ids)
+        result = self.conn.prepare(name, operation, nparams, param_types)
+        result.check_cmd_result()
+        result.clear()
+
+        self._deallocate([evicted for _, evicted in self.statement_cache.put(key, name)])
+        return name
+
+    def _discard_statement(self, operation, param_types, deallocate=True):
+        '''
+        Forget the prepared statement for operation, if there is one, so it
+        is run unprepared and prepared afresh. deallocate is unset when the
+        statement is already gone from the server.
+        '''
+        key = (operation, tuple(param_types) if param_types else ())
+        name = self.statement_cache.pop(key)
+        if name is not None and deallocate:
+            self._deallocate([name])
+
+    def _deallocate(self, names=()):
+        '''
+        Deallocate the prepared statements named, and any left over from a
+        failed transaction. In a failed transaction, this can not be done, so
+        they are kept until it has ended. In an open transaction, it is done
+        in a savepoint, so a failure does not abort the transaction.
+
+        A failure is only logged, as it is not an error in the operation
+        being run, and leaves at worst a statement unused until the session
+        ends.
+        '''
+        self._deallocations.extend(names)
+        if not self._deallocations:
+            return
+        txn_state = self.conn.transaction_status()
+        if txn_state not in (libpq.PQTRANS_IDLE, libpq.PQTRANS_INTRANS):
+            return
+        statements = [
+            'DEALLOCATE %s' % name for name in self._deallocations
+        ]
+        self._deallocations = []
+        if txn_state == libpq.PQTRANS_INTRANS:
+            statements = [
+                'SAVEPOINT _egress_deallocate',
+                *statements,
+                'RELEASE SAVEPOINT _egress_deallocate',
+            ]
+        result = self.conn.execute('; '.join(statements))
+        try:
+            result.check_cmd_result()
+        except exceptions.DatabaseError as exc:
+            log.warning('Failed to deallocate prepared statements: %s', exc.args[0])
+            if txn_state == libpq.PQTRANS_INTRANS:
+                self.conn.execute(
+                    'ROLLBACK TO SAVEPOINT _egress_deallocate; '
+                    'RELEASE SAVEPOINT _egress_deallocate'
+                ).check_cmd_result()
+            return
+        result.clear()
+
+    def _forget_statements(self, deallocate=True):
+        '''
+        Forget all the statements this connection has prepared, deallocating
+        them unless deallocate is unset, as they are already gone.
+        '''
+        names = [name for _, name in self.statement_cache.items()]
+        self.statement_cache.clear()
+        self._statement_counts.clear()
+        if deallocate:
+            self._deallocate(names)
+        else:
+            self._deallocations = []
+
+    def _command_done(self, status):
+        '''
+        Deallocate the statements this connection has prepared, and forget
+        the descriptions of results, after a command which may have changed
+        the result types or column names of their queries.
+
+        status is the command status of its result.
+        '''
+        command = status.split(' ', 1)[0] if status else None
+        if command == 'DEALLOCATE':
+            # Run by the user, so the statements cached may no longer exist
+            self._forget_statements(status != 'DEALLOCATE ALL')
+            return
+        if command not in SCHEMA_COMMANDS:
+            # Such as a ROLLBACK, ending a failed transaction
+            self._deallocate()
+            return
+        self.description_cache.clear()
+        self._forget_statements(status != 'DISCARD ALL')
+
+    def _end_stream(self):
+        '''
+        Finish any streaming query, so the connection is free for another.
+        '''
+        if self._stream is not None:
+            self._stream._end_stream()
+
     def _close_cursor(self, cursor):
         '''
         Remove a cursor from out tracking list.
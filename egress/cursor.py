@@ -1,15 +1,63 @@
 import itertools
 import re
+import select
+import struct
 
 from collections import namedtuple
 from ctypes import c_char_p, c_int, c_uint
+from functools import lru_cache
 
 from . import libpq, types
-from .exceptions import InterfaceError
+from .cache import TextDictionary
+from .exceptions import (
+    DataError, DatabaseError, InterfaceError, NotSupportedError,
+    OperationalError, ProgrammingError,
+)
 
 
 PARAM_RE = re.compile('\$(\d+)')
 
+# Semicolons and space ending a query, which can not be wrapped in a COPY
+TRAILING_RE = re.compile(r'[\s;]+$')
+
+# Tokens of SQL which may contain a semicolon that does not end a statement
+STATEMENT_RE = re.compile(r'''
+    (?P<comment>--[^\n]*)
+  | (?P<block>/\*)
+  | (?P<semicolon>;)
+  | (?P<paren>[()])
+  | (?P<space>\s+)
+  | (?<![\w$])[Ee]'(?:[^'\\]|\\.|'')*'
+  | '(?:[^']|'')*'
+  | "(?:[^"]|"")*"
+  | \$(?P<tag>(?:[A-Za-z_][\w]*)?)\$.*?\$(?P=tag)\$
+  | (?P<word>[A-Za-z_][\w$]*)
+  | [^;'"$\-/()\sA-Za-z_]+
+  | .
+''', re.DOTALL | re.VERBOSE)
+
+# The delimiters of block comments, which nest
+BLOCK_COMMENT_RE = re.compile(r'/\*|\*/')
+
+# Header and trailer of the binary COPY format
+COPY_HEADER = b'PGCOPY\n\xff\r\n\x00' + struct.pack('!ii', 0, 0)
+COPY_TRAILER = struct.pack('!h', -1)
+
+# The libpq arguments for a statement without parameters
+NO_PARAMS = (0, None, None, None, None)
+
+# SQLSTATE of "cached plan must not change result type"
+STALE_PLAN = '0A000'
+# SQLSTATE of "prepared statement does not exist"
+MISSING_STATEMENT = '26000'
+
+COPY_COLUMNS_QUERY = b'''
+SELECT attname, atttypid::int8
+  FROM pg_attribute
+ WHERE attrelid = $1::regclass AND attnum > 0 AND NOT attisdropped
+ ORDER BY attnum
+'''
+
 Description = namedtuple('Description', (
     'name',
     'type_code',
@@ -22,6 +70,186 @@ Description = namedtuple('Description', (
 ))
 
 
+@lru_cache(maxsize=256)
+def get_row_decoder(column_types):
+    '''
+    Build a function to decode a single row of a result whose columns have the
+    given types.
+
+    The function is generated to suit the exact column layout, with each
+    column's parser bound as a global, so decoding a row involves no looping
+    or dispatch on type.
+    '''
+    namespace = {
+        'getisnull': libpq.PQgetisnull,
+        'getvalue': libpq.PQgetvalue,
+        'getlength': libpq.PQgetlength,
+    }
+    cells = []
+    for idx, cast_func in enumerate(column_types):
+        if issubclass(cast_func, types.FixedWidthType):
+            namespace['unpack_%d' % idx] = cast_func._struct.unpack
+            value = 'unpack_{0}(getvalue(res, row, {0})[:{1}])[0]'.format(idx, cast_func.size)
+        elif issubclass(cast_func, types.BinaryType):
+            # zero_copy is checked per row, as it may be changed after this
+            # decoder has been cached
+            namespace['binary_%d' % idx] = cast_func
+            value = (
+                '(result.get_view(row, {0}) if binary_{0}.zero_copy'
+                ' else getvalue(res, row, {0})[:getlength(res, row, {0})])'
+            ).format(idx)
+        else:
+            namespace['parse_%d' % idx] = cast_func.parse
+            value = 'parse_{0}(getvalue(res, row, {0}), getlength(res, row, {0}), tzinfo)'.format(idx)
+        cells.append('        None if getisnull(res, row, {0}) else {1},\n'.format(idx, value))
+
+    source = (
+        'def decode_row(result, row, tzinfo):\n'
+        '    res = result._result\n'
+        '    return (\n%s    )\n'
+    ) % ''.join(cells)
+    exec(source, namespace)
+    return namespace['decode_row']
+
+
+@lru_cache(maxsize=512)
+def convert_operation(operation, has_parameters):
+    '''
+    Convert an operation using %s placeholders to the $n form postgres
+    expects, and encode it.
+
+    Returns the operation and the number of parameters it expects.
+    '''
+    # Convert %s -> $n
+    if has_parameters:
+        ctr = itertools.count(1)
+
+        def repl(match):
+            return '$%d' % next(ctr)
+        operation = re.sub('(?<!%)%s', repl, operation)
+    operation = operation.replace('%%', '%')
+
+    param_count = len(PARAM_RE.findall(operation))
+
+    if isinstance(operation, str):
+        operation = operation.encode('utf-8')
+
+    return operation, param_count
+
+
+@lru_cache(maxsize=512)
+def split_statements(operation):
+    '''
+    Split an operation into the statements it contains, ignoring semicolons
+    in quotes, (nested) comments and parentheses, and statements which are
+    empty.
+
+    As psql does, semicolons are also ignored within the BEGIN ... END (or
+    CASE ... END) blocks of a CREATE FUNCTION or PROCEDURE, so SQL-standard
+    function bodies are kept whole.
+    '''
+    if ';' not in operation:
+        return (operation,)
+    statements = []
+    start = 0
+    empty = True
+    # The first words of the statement, and the depth of blocks in its body
+    words = []
+    depth = 0
+    parens = 0
+    pos = 0
+    while pos < len(operation):
+        match = STATEMENT_RE.match(operation, pos)
+        pos = match.end()
+        kind = match.lastgroup
+        if kind == 'block':
+            pos = comment_end(operation, pos)
+        elif kind == 'paren':
+            empty = False
+            if match.group() == '(':
+                parens += 1
+            elif parens:
+                parens -= 1
+        elif kind == 'semicolon' and not depth and not parens:
+            if not empty:
+                statements.append(operation[start:match.start()].strip())
+            start = match.end()
+            empty = True
+            words = []
+        elif kind == 'word':
+            empty = False
+            word = match.group().upper()
+            if len(words) < 4:
+                words.append(word)
+            if words[0] == 'CREATE' and ('FUNCTION' in words or 'PROCEDURE' in words):
+                if word in ('BEGIN', 'CASE'):
+                    depth += 1
+                elif word == 'END' and depth:
+                    depth -= 1
+        elif kind not in ('comment', 'space'):
+            empty = False
+    if not empty:
+        statements.append(operation[start:].strip())
+    return tuple(statements)
+
+
+def comment_end(operation, pos):
+    '''
+    Return the end of the block comment opened just before pos, counting
+    those nested in it, or the end of operation if it is not closed.
+    '''
+    nesting = 1
+    for match in BLOCK_COMMENT_RE.finditer(operation, pos):
+        nesting += 1 if match.group() == '/*' else -1
+        if not nesting:
+            return match.end()
+    return len(operation)
+
+
+def parse_copy_rows(buf, pos, column_types, tzinfo):
+    '''
+    Decode the complete rows of binary COPY data in buf, starting at pos.
+
+    The fields are split out row by row, and then parsed a column at a time.
+    Returns the rows and the position of the first incomplete row.
+    '''
+    unpack_from = struct.unpack_from
+    end = len(buf)
+    ncols = len(column_types)
+    fields = []
+    while end - pos >= 2:
+        if unpack_from('!h', buf, pos)[0] == -1:
+            # File trailer
+            pos = end
+            break
+        row = []
+        offs = pos + 2
+        for _ in range(ncols):
+            if end - offs < 4:
+                break
+            size = unpack_from('!i', buf, offs)[0]
+            offs += 4
+            if size == -1:
+                row.append(None)
+                continue
+            if end - offs < size:
+                break
+            row.append(buf[offs:offs+size])
+            offs += size
+        if len(row) < ncols:
+            break
+        fields.append(row)
+        pos = offs
+
+    if not fields:
+        return [], pos
+    columns = [
+        column_type.parse_column(values, tzinfo)
+        for column_type, values in zip(column_types, zip(*fields))
+    ]
+    return list(zip(*columns)), pos
+
+
 def requires_connection(func):
     def _wrapper(self, *args, **kwargs):
         if not self.conn or not self.conn.conn:
@@ -32,11 +260,32 @@ def requires_connection(func):
 
 
 class Cursor(object):
+    # Number of statements executemany sends before waiting for results.
+    executemany_batch_size = 1000
+    # Size of the chunks of data sent by copy_records.
+    copy_buffer_size = 65536
+    # Number of records copy_records encodes, and copy_out decodes, a column
+    # at a time.
+    copy_batch_size = 1000
+    # If set, fetchmany and fetchall decode text columns (text, varchar,
+    # bpchar and enums) through a TextDictionary of up to this many values
+    # per column, so repeated values share one str. name columns are left
+    # out, as their empty values decode to None.
+    text_dictionary_size = 0
+
     def __init__(self, conn):
         self.conn = conn
-        self.query = None
+        self._query = None
+        self._query_args = None
         self.arraysize = 1
         self._result = None
+        self._operation = None
+        self._streaming = False
+        self._copying = False
+        self._nextsets = []
+        self._formatters = None
+        self._param_buffers = {}
+        self._text_dictionaries = None
         self.tzinfo = self.conn.tzinfo
         self._cleanup()
 
@@ -52,22 +301,36 @@ class Cursor(object):
             self._result.clear()
             self._result = None
 
+    def _free_nextsets(self):
+        for result, operation in self._nextsets:
+            result.clear()
+        self._nextsets = []
+
     def _cleanup(self):
         '''
         Internal function to clean up state when beginning a new operation.
         '''
+        self._end_stream()
         self._free_result()
+        self._free_nextsets()
         self._rowcount = None
+        self._ntuples = 0
+        self._resultrow = -1
         self._description = None
 
-    def _set_result(self, result):
+    def _set_result(self, result, operation=None):
         '''
         Given a result object, update all our attributes.
+
+        If the operation which produced it is given, the description and row
+        decoder are looked up in the connection's description cache, keyed by
+        the operation and the result's column types.
         '''
         self._cleanup()
 
         self._result = result
-        self._nfields = nfields = result.nfields()
+        self._nfields = result.nfields()
+        self._ntuples = result.ntuples()
 
         status = result.status()
         if status == libpq.PGRES_COMMAND_OK:
@@ -79,10 +342,72 @@ class Cursor(object):
         elif status == libpq.PGRES_TUPLES_OK:
             self._rowcount = result.ntuples()
 
+        self._describe(operation)
+        self._resultrow = -1
+
+        self._text_dictionaries = None
+        if self.text_dictionary_size:
+            dictionaries = [
+                TextDictionary(self.text_dictionary_size)
+                if issubclass(desc.cast_func, types.StringType) else None
+                for desc in self._description
+            ]
+            if any(dictionaries):
+                self._text_dictionaries = dictionaries
+
+    def _describe(self, operation, refresh=False):
+        '''
+        Set the description and row decoder of the current result, from the
+        description cache unless refresh is set.
+        '''
+        result = self._result
+        self._operation = operation
+        signature = tuple(
+            (result.field_type(field), result.field_modifier(field))
+            for field in range(self._nfields)
+        )
+
+        cache = self.conn.description_cache if operation is not None else None
+        cached = None
+        if cache is not None and not refresh:
+            cached = cache.get((operation, signature))
+        if cached is None:
+            column_types = self.conn.type_registry.lookup(
+                self.conn.conn, [ftype for ftype, fmod in signature],
+            )
+            description = self._build_description(result, signature, column_types)
+            cached = (
+                description,
+                get_row_decoder(tuple(desc.cast_func for desc in description)),
+            )
+            if cache is not None:
+                cache.put((operation, signature), cached)
+
+        self._description, self._decode_row = cached
+
+    def _lookup_type(self, exc, seen):
+        '''
+        Look up the type a value being decoded was found to hold, as
+        TypeLookupNeeded exc reports, and describe the current result again.
+
+        seen holds the OIDs already looked up for this row or rows, if any, so
+        a type which can not be resolved raises a TypeError rather than
+        looping. Returns it with exc's OID added.
+        '''
+        seen = seen or set()
+        if exc.oid in seen or not self.conn.type_registry.refresh(self.conn.conn, exc.oid):
+            raise TypeError('Unknown type for value: %r' % exc.oid) from None
+        seen.add(exc.oid)
+        self._describe(self._operation, True)
+        return seen
+
+    @staticmethod
+    def _build_description(result, signature, column_types):
+        '''
+        Build the list of Description records for a result.
+        '''
         desc = []
-        for field in range(nfields):
-            ftype = result.field_type(field)
-            fmod = result.field_modifier(field)
+        for field, ((ftype, fmod), cast_func) in enumerate(zip(signature, column_types)):
             fname = result.field_name(field)
             fsize = result.field_size(field)
             if fmod > 0:
@@ -101,9 +426,7 @@ class Cursor(object):
             else:
                 prec = scale = None
 
-            try:
-                cast_func = types.infer_parser(ftype, fmod)
-            except:
+            if cast_func is None:
                 raise TypeError('Unknown type for field %r: %r(%x) %r' % (fname, ftype, ftype, fmod))
             desc.append(Description(
                 fname,
@@ -115,8 +438,7 @@ class Cursor(object):
                 None,
                 cast_func,
             ))
-        self._description = desc
-        self._resultrow = -1
+        return desc
 
     def __iter__(self):
         return self
@@ -159,6 +481,22 @@ class Cursor(object):
         '''
         return self._description
 
+    @property
+    def query(self):
+        '''
+        The text of the last operation executed, with its parameters
+        interpolated.
+
+        This is only built when it is asked for.
+        '''
+        if self._query is None and self._query_args is not None:
+            operation, parameters = self._query_args
+
+            def unrepl(m):
+                return str(parameters[int(m.group(0).lstrip('$'))-1])
+            self._query = PARAM_RE.sub(unrepl, operation.decode('utf-8'))
+        return self._query
+
     @property
     def rowcount(self):
         '''
@@ -228,21 +566,187 @@ class Cursor(object):
         multiple rows in a single operation, but this kind of usage is
         deprecated: .executemany() should be used instead.
 
+        Without parameters, operation may contain several statements. Their
+        results are all read, and .nextset() moves from one to the next. When
+        libpq supports pipeline mode they are sent in a single round trip, and
+        run in one transaction.
+
         Return values are not defined.
         '''
-        # Convert %s -> $n
-        if parameters:
-            ctr = itertools.count(1)
+        formatters = self._take_formatters()
+        if not parameters and isinstance(operation, str):
+            statements = split_statements(operation)
+            if len(statements) > 1:
+                return self._execute_batch(operation, statements)
+
+        operation, params = self._prepare(operation, parameters, formatters)
+
+        begin = self._needs_begin()
+        name = self.conn._prepared_statement(operation, *params[:2], begin=begin)
+        try:
+            result = self._execute_params(operation, name, params, begin)
+        except (NotSupportedError, OperationalError) as exc:
+            # The result type of a prepared statement changes when a table it
+            # reads is altered, perhaps by another connection, and it may
+            # have been deallocated behind our back. It is run again
+            # unprepared, unless that error aborted a transaction which was
+            # not started here.
+            code = exc.args[-1]
+            if name is None or code not in (STALE_PLAN, MISSING_STATEMENT):
+                raise
+            deallocate = code != MISSING_STATEMENT
+            in_txn = self.conn._in_txn
+            if in_txn and not begin:
+                self.conn._discard_statement(operation, params[1], deallocate)
+                raise
+            if in_txn:
+                self.conn.conn.execute('ROLLBACK').check_cmd_result()
+            self.conn._discard_statement(operation, params[1], deallocate)
+            result = self._execute_params(operation, None, params, begin)
+
+        self.conn._command_done(result.cmd_status())
+        self._set_result(result, operation)
+
+    def _execute_params(self, operation, name, params, begin):
+        '''
+        Execute an operation, or the prepared statement name for it, starting
+        a transaction first if begin is set, and return its result.
+        '''
+        pgconn = self.conn.conn
+        result = None
+        if begin and not self.conn._in_txn:
+            if libpq.HAS_PIPELINE:
+                result = self._exec_with_begin(operation, name, params)
+            else:
+                pgconn.execute('BEGIN').check_cmd_result()
+
+        if result is None:
+            if name is None:
+                result = pgconn.exec_params(operation, *params, 1)
+            else:
+                result = pgconn.exec_prepared(name, params[0], *params[2:], 1)
+
+        # Did it succeed?
+        result.check_cmd_result()
+        return result
+
+    @requires_connection
+    def execute_stream(self, operation, parameters=None):
+        '''
+        Execute a database operation, streaming its rows rather than buffering
+        the whole result in memory.
+
+        Rows are read from the server as they are consumed through the
+        .fetch*() methods or iteration. If libpq supports chunked rows mode,
+        up to .arraysize rows are buffered at a time; otherwise one.
+
+        The connection can not run other operations until the stream is
+        exhausted, so doing so will discard any rows not yet read.
+
+        rowcount is -1 until all rows have been read.
+
+        Types which are not built in can not be looked up while the rows are
+        arriving, so a TypeError is raised for any not already known.
+        '''
+        self._cleanup()
+        operation, params = self._prepare(operation, parameters, self._take_formatters())
+        self._begin()
+
+        pgconn = self.conn.conn
+        if not pgconn.send_query_params(operation, *params, 1):
+            raise OperationalError(pgconn.error_message())
+        if libpq.HAS_CHUNKED_ROWS and self.arraysize > 1:
+            pgconn.set_chunked_rows_mode(self.arraysize)
+        else:
+            pgconn.set_single_row_mode()
+
+        result = self._stream_result(pgconn)
+        try:
+            self._set_result(result, operation)
+        except TypeError:
+            # The types can not be looked up while the rows are arriving
+            pgconn.drain()
+            raise
+        if result.status() in libpq.STREAM_STATUSES:
+            self._streaming = True
+            self._rowcount = -1
+            self._streamed = self._ntuples
+            self.conn._stream = self
+        else:
+            pgconn.drain()
+
+    def _stream_result(self, pgconn):
+        '''
+        Read the next result from a streaming query, raising any error after
+        the connection has been drained.
+        '''
+        result = pgconn.get_result()
+        try:
+            result.check_cmd_result()
+        except:
+            pgconn.drain()
+            raise
+        return result
+
+    def _next_chunk(self, size=None):
+        '''
+        Called when the current result is exhausted. When streaming, load the
+        next batch of rows and return True; otherwise release the result.
+
+        size is a hint of how many more rows are wanted, or None for all.
+        '''
+        if not self._streaming:
+            self._free_result()
+            return False
+
+        pgconn = self.conn.conn
+        try:
+            result = self._stream_result(pgconn)
+        except:
+            self._streaming = False
+            self.conn._stream = None
+            self._free_result()
+            raise
+        self._free_result()
+        if result.status() in libpq.STREAM_STATUSES:
+            self._result = result
+            self._ntuples = result.ntuples()
+            self._streamed += self._ntuples
+            self._resultrow = -1
+            return True
+
+        # The final, empty, result marks the end of the rows.
+        result.clear()
+        self._end_stream()
+        self._rowcount = self._streamed
+        return False
+
+    def _end_stream(self):
+        '''
+        Finish a streaming query or COPY, discarding any rows not yet read.
+        '''
+        if self._streaming or self._copying:
+            self._streaming = self._copying = False
+            self.conn._stream = None
+            self.conn.conn.drain()
 
-            def repl(match):
-                return '$%d' % next(ctr)
-            operation = re.sub('(?<!%)%s', repl, operation)
-        operation = operation.replace('%%', '%')
+    def _take_formatters(self):
+        '''
+        Return the formatters declared by setinputsizes for this operation,
+        clearing them for the next.
+        '''
+        formatters, self._formatters = self._formatters, None
+        return formatters
 
-        param_count = len(PARAM_RE.findall(operation))
+    def _prepare(self, operation, parameters, formatters=None):
+        '''
+        Convert an operation and its parameters to the form libpq expects,
+        formatting them with formatters if given.
 
-        if isinstance(operation, str):
-            operation = operation.encode('utf-8')
+        Returns the encoded operation and a tuple of the parameter count and
+        the type, value, length and format arrays.
+        '''
+        operation, param_count = convert_operation(operation, bool(parameters))
 
         if parameters:
             pcount = len(parameters)
@@ -251,12 +755,19 @@ class Cursor(object):
                     pcount, param_count,
                 ))
 
-            paramTypes = (c_uint * pcount)()
-            paramValues = (c_char_p * pcount)()
-            paramLengths = (c_int * pcount)()
-            paramFormats = (c_int * pcount)()
-            for idx, param in enumerate(parameters):
-                t, v, l, f = types.format_type(param)
+            try:
+                paramTypes, paramValues, paramLengths, paramFormats = self._param_buffers[pcount]
+            except KeyError:
+                paramTypes, paramValues, paramLengths, paramFormats = self._param_buffers[pcount] = (
+                    (c_uint * pcount)(),
+                    (c_char_p * pcount)(),
+                    (c_int * pcount)(),
+                    (c_int * pcount)(),
+                )
+            if formatters is None or len(formatters) != pcount:
+                formatters = itertools.repeat(types.format_type)
+            for idx, (param, format_type) in enumerate(zip(parameters, formatters)):
+                t, v, l, f = format_type(param)
                 paramTypes[idx] = t
                 paramValues[idx] = v
                 paramLengths[idx] = l
@@ -266,29 +777,133 @@ class Cursor(object):
             parameters = []
             paramTypes = paramValues = paramLengths = paramFormats = None
 
-        def unrepl(m):
-            return str(parameters[int(m.group(0).lstrip('$'))-1])
-        self.query = PARAM_RE.sub(unrepl, operation.decode('utf-8'))
+        self._query = None
+        self._query_args = (operation, tuple(parameters))
+
+        return operation, (len(parameters), paramTypes, paramValues, paramLengths, paramFormats)
+
+    def _needs_begin(self):
+        '''
+        Free the connection of any stream, and report if a transaction needs
+        to be started.
+        '''
+        self.conn._end_stream()
+        return not (self.conn._autocommit or self.conn._in_txn)
 
-        # print('{%r:%r}[A:%r T:%r] %r : %r' % (id(self.conn), id(self), self.conn._autocommit, self.conn._in_txn, operation, parameters))
-        if not (self.conn._autocommit or self.conn._in_txn):
+    def _begin(self):
+        '''
+        Start a transaction, if one is needed and not already open.
+        '''
+        if self._needs_begin():
             result = self.conn.conn.execute('BEGIN')
             result.check_cmd_result()
 
-        result = self.conn.conn.exec_params(
-            operation,
-            len(parameters),
-            paramTypes,
-            paramValues,
-            paramLengths,
-            paramFormats,
-            1
-        )
+    def _exec_with_begin(self, operation, name, params):
+        '''
+        Execute an operation, preceded by a BEGIN in the same pipeline so both
+        go to the server in a single round trip.
 
-        # Did it succeed?
-        result.check_cmd_result()
+        Returns the operation's result, or raises the error from the BEGIN.
+        '''
+        begin, result = self._pipeline_execute([
+            (b'BEGIN', None, NO_PARAMS),
+            (operation, name, params),
+        ])
+        begin.clear()
+        return result
 
-        self._set_result(result)
+    def _execute_batch(self, operation, statements):
+        '''
+        Execute the statements operation contains, which has no parameters,
+        keeping their results for .nextset().
+        '''
+        self._cleanup()
+        self._query = None
+        self._query_args = (convert_operation(operation, False)[0], ())
+        operations = [convert_operation(statement, False)[0] for statement in statements]
+        if libpq.HAS_PIPELINE:
+            commands = [(operation, None, NO_PARAMS) for operation in operations]
+            if self._needs_begin():
+                results = self._pipeline_execute([(b'BEGIN', None, NO_PARAMS)] + commands)
+                results.pop(0).clear()
+            else:
+                results = self._pipeline_execute(commands)
+        else:
+            pgconn = self.conn.conn
+            # As in a pipeline, the statements are run in one transaction
+            atomic = self.conn._autocommit and not self.conn._in_txn
+            if atomic:
+                pgconn.execute('BEGIN').check_cmd_result()
+            else:
+                self._begin()
+            results = []
+            try:
+                for operation in operations:
+                    result = pgconn.exec_params(operation, *NO_PARAMS, 1)
+                    results.append(result)
+                    result.check_cmd_result()
+                if atomic:
+                    pgconn.execute('COMMIT').check_cmd_result()
+            except:
+                for result in results:
+                    result.clear()
+                if atomic:
+                    pgconn.execute('ROLLBACK').clear()
+                raise
+
+        for result in results:
+            self.conn._command_done(result.cmd_status())
+        nextsets = list(zip(results, operations))
+        self._set_result(*nextsets.pop(0))
+        self._nextsets = nextsets
+
+    def _pipeline_execute(self, commands):
+        '''
+        Send a list of (operation, statement name, params) commands in a
+        single pipeline, and return their results.
+
+        The first error is raised once all the results have been read.
+        '''
+        pgconn = self.conn.conn
+        results = []
+        pgconn.enter_pipeline_mode()
+        pgconn.set_nonblocking(1)
+        try:
+            sent = 0
+            try:
+                for operation, name, params in commands:
+                    if name is None:
+                        self._pipeline_send(operation, params)
+                    elif not pgconn.send_query_prepared(name, params[0], *params[2:], 1):
+                        raise OperationalError(pgconn.error_message())
+                    else:
+                        self._pipeline_flush()
+                    sent += 1
+            finally:
+                pgconn.pipeline_sync()
+                for _ in range(sent):
+                    results.append(pgconn.get_result())
+                    # Each statement's results are followed by a NULL
+                    pgconn.get_result()
+                # The end of the pipeline is marked by a PIPELINE_SYNC result
+                sync = pgconn.get_result()
+                if sync is not None:
+                    sync.clear()
+        finally:
+            pgconn.set_nonblocking(0)
+            pgconn.exit_pipeline_mode()
+
+        try:
+            for result in results:
+                if result is None:
+                    raise OperationalError(pgconn.error_message())
+                result.check_cmd_result()
+        except:
+            for result in results:
+                if result is not None:
+                    result.clear()
+            raise
+        return results
 
     def executemany(self, operation, seq_of_parameters):
         '''
@@ -308,18 +923,406 @@ class Cursor(object):
         The same comments as for .execute() also apply accordingly to this
         method.
 
+        When libpq supports pipeline mode, the statements are sent in batches
+        of .executemany_batch_size without waiting for each one to complete.
+        In autocommit mode, all the batches are run in a single transaction,
+        between a BEGIN and a COMMIT, so if any statement fails none of them
+        are committed.
+
+        If a statement fails, the exception raised has an index attribute
+        giving the position of its parameters in seq_of_parameters.
+
         Return values are not defined.
         '''
-        # Prepare
-        result = None
-        for params in seq_of_parameters:
-            if result:
+        formatters = self._take_formatters()
+        if not libpq.HAS_PIPELINE:
+            rowcount = 0
+            for index, parameters in enumerate(seq_of_parameters):
+                self._formatters = formatters
+                try:
+                    self.execute(operation, parameters)
+                except DatabaseError as exc:
+                    exc.index = index
+                    raise
+                rowcount += max(self._rowcount or 0, 0)
+            self._rowcount = rowcount
+            return
+
+        self._cleanup()
+        begin = self._needs_begin()
+        pgconn = self.conn.conn
+        # Without a transaction, each batch would be committed separately.
+        atomic = self.conn._autocommit and not self.conn._in_txn
+
+        last = None
+        rowcount = 0
+        pending = []
+        # The command statuses of the statements run
+        statuses = set()
+        pgconn.enter_pipeline_mode()
+        pgconn.set_nonblocking(1)
+        try:
+            try:
+                if begin or atomic:
+                    self._pipeline_send(b'BEGIN', NO_PARAMS)
+                    pending.append(None)
+                for index, parameters in enumerate(seq_of_parameters):
+                    sql, params = self._prepare(operation, parameters, formatters)
+                    self._pipeline_send(sql, params)
+                    pending.append(index)
+                    if len(pending) >= self.executemany_batch_size:
+                        batch, pending = pending, []
+                        last, count = self._pipeline_results(batch, last, statuses)
+                        rowcount += count
+                if atomic:
+                    self._pipeline_send(b'COMMIT', NO_PARAMS)
+                    pending.append(None)
+                batch, pending = pending, []
+                last, count = self._pipeline_results(batch, last, statuses)
+                rowcount += count
+            except:
+                if pending:
+                    try:
+                        self._pipeline_results(pending, None, statuses)
+                    except DatabaseError:
+                        pass
+                raise
+            finally:
+                pgconn.set_nonblocking(0)
+                pgconn.exit_pipeline_mode()
+        except:
+            if atomic:
+                pgconn.execute('ROLLBACK').clear()
+            raise
+        finally:
+            for status in statuses:
+                self.conn._command_done(status)
+
+        if last is not None:
+            self._set_result(last, operation)
+        self._rowcount = rowcount
+
+    def _pipeline_send(self, operation, params):
+        pgconn = self.conn.conn
+        if not pgconn.send_query_params(operation, *params, 1):
+            raise OperationalError(pgconn.error_message())
+        self._pipeline_flush()
+
+    def _pipeline_flush(self):
+        '''
+        Send the statements queued in the pipeline, which is in nonblocking
+        mode. While the server is not accepting more, the results it has sent
+        are read, so neither side waits on the other with its buffers full.
+        '''
+        pgconn = self.conn.conn
+        while True:
+            status = pgconn.flush()
+            if status == 0:
+                return
+            if status < 0:
+                raise OperationalError(pgconn.error_message())
+            sock = pgconn.socket()
+            readable, _, _ = select.select([sock], [sock], [])
+            if readable and not pgconn.consume_input():
+                raise OperationalError(pgconn.error_message())
+
+    def _pipeline_results(self, pending, last, statuses):
+        '''
+        Sync the pipeline and read the results of the statements sent.
+
+        pending lists the index of the parameters for each statement, or None
+        for statements we added. The command statuses of those which succeed
+        are added to the set statuses. Returns the last result and the total
+        number of rows affected. The first error is raised once all the
+        results have been read.
+        '''
+        pgconn = self.conn.conn
+        if not pgconn.pipeline_sync():
+            raise OperationalError(pgconn.error_message())
+
+        error = None
+        rowcount = 0
+        for index in pending:
+            result = pgconn.get_result()
+            if result is None:
+                raise OperationalError(pgconn.error_message())
+            # Each statement's results are followed by a NULL
+            pgconn.get_result()
+            if error is None:
+                try:
+                    result.check_cmd_result()
+                except DatabaseError as exc:
+                    exc.index = index
+                    error = exc
+                    continue
+                statuses.add(result.cmd_status())
+            if index is None or error is not None:
+                result.clear()
+                continue
+            count = result.cmd_tuples()
+            if count:
+                rowcount += int(count)
+            if last is not None:
+                last.clear()
+            last = result
+
+        # The end of the batch is marked by a PIPELINE_SYNC result
+        pgconn.get_result().clear()
+        if error is not None:
+            if last is not None:
+                last.clear()
+            raise error
+        return last, rowcount
+
+    @requires_connection
+    def copy_records(self, table, columns, records):
+        '''
+        Load records into a table with a binary COPY FROM STDIN.
+
+        columns is a sequence of the names of the columns each record holds
+        values for, or None for all of the table's columns. Values are encoded
+        according to the type of their column.
+
+        records may be any iterable of sequences. It is consumed as the data is
+        sent, in chunks of about .copy_buffer_size bytes, so it need not fit in
+        memory.
+
+        rowcount is set to the number of rows copied.
+        '''
+        self._cleanup()
+        self._begin()
+        pgconn = self.conn.conn
+
+        columns, encoders = self._copy_columns(table, columns)
+        copy = 'COPY %s (%s) FROM STDIN (FORMAT binary)' % (
+            table,
+            ', '.join('"%s"' % name.replace('"', '""') for name in columns),
+        )
+        result = pgconn.execute(copy)
+        if result.status() != libpq.PGRES_COPY_IN:
+            pgconn.drain()
+            result.check_cmd_result()
+            raise InterfaceError('Expected COPY IN, got %s' % result.status_text())
+        result.clear()
+
+        try:
+            self._copy_send(columns, encoders, records)
+        except BaseException as exc:
+            pgconn.put_copy_end('COPY aborted: %r' % exc)
+            pgconn.drain()
+            raise
+        if pgconn.put_copy_end() != 1:
+            raise OperationalError(pgconn.error_message())
+
+        result = pgconn.get_result()
+        pgconn.drain()
+        result.check_cmd_result()
+        self._set_result(result)
+
+    def _copy_columns(self, table, columns):
+        '''
+        Find the encoders for the columns of table we are copying into.
+        '''
+        pgconn = self.conn.conn
+        value = (c_char_p * 1)(table.encode('utf-8'))
+        result = pgconn.exec_params(COPY_COLUMNS_QUERY, 1, None, value, None, None, 1)
+        result.check_cmd_result()
+        ntuples = result.ntuples()
+        names = types.NameDataType.parse_column(result.get_column(0, 0, ntuples), None)
+        oids = types.LongType.parse_column(result.get_column(1, 0, ntuples), None)
+        result.clear()
+
+        column_types = dict(zip(names, oids))
+        if columns is None:
+            columns = names
+        try:
+            oids = [column_types[name] for name in columns]
+        except KeyError as exc:
+            raise ProgrammingError('Column %r of %r does not exist' % (exc.args[0], table))
+        encoders = []
+        kinds = self.conn.type_registry.lookup(pgconn, oids)
+        for name, oid, kind in zip(columns, oids, kinds):
+            if kind is None:
+                raise NotSupportedError('No binary encoder for column %r: %r' % (name, oid))
+            encoders.append(kind.format_column)
+        return columns, encoders
+
+    def _copy_send(self, names, encoders, records):
+        '''
+        Send records in the binary COPY format.
+
+        Records are encoded in batches of .copy_batch_size, a column at a
+        time. Values which can not be encoded as their column's type raise
+        DataError.
+        '''
+        pgconn = self.conn.conn
+        ncols = len(encoders)
+        field_count = struct.pack('!h', ncols)
+        pack_length = struct.Struct('!i').pack
+        null = pack_length(-1)
+        chunk_size = self.copy_buffer_size
+
+        buf = bytearray(COPY_HEADER)
+        records = iter(records)
+        while True:
+            batch = list(itertools.islice(records, self.copy_batch_size))
+            if not batch:
+                break
+            for record in batch:
+                if len(record) != ncols:
+                    raise InterfaceError('Incorrect number of values: %d (expected %d)' % (
+                        len(record), ncols,
+                    ))
+            columns = []
+            for name, encode, values in zip(names, encoders, zip(*batch)):
+                try:
+                    columns.append(encode(list(values)))
+                except (AttributeError, ArithmeticError, KeyError, TypeError, ValueError, struct.error) as exc:
+                    raise DataError('Can not encode a value for column %r: %s' % (name, exc)) from exc
+            for row in zip(*columns):
+                buf += field_count
+                for data in row:
+                    if data is None:
+                        buf += null
+                    else:
+                        buf += pack_length(len(data))
+                        buf += data
+                if len(buf) >= chunk_size:
+                    if pgconn.put_copy_data(bytes(buf)) != 1:
+                        raise OperationalError(pgconn.error_message())
+                    buf.clear()
+        buf += COPY_TRAILER
+        if pgconn.put_copy_data(bytes(buf)) != 1:
+            raise OperationalError(pgconn.error_message())
+
+    @requires_connection
+    def copy_out(self, query, file=None):
+        '''
+        Run query with a binary COPY TO STDOUT.
+
+        If file is given, the raw COPY data is written to it, and None is
+        returned. Otherwise, a generator is returned which decodes the rows as
+        they arrive; the connection can not be used for anything else until
+        it is exhausted, and doing so discards the remaining rows.
+
+        rowcount is set to the number of rows copied once the COPY is complete.
+        '''
+        self._cleanup()
+        self._begin()
+        pgconn = self.conn.conn
+
+        query = TRAILING_RE.sub('', query)
+        copy = b'COPY (%s) TO STDOUT (FORMAT binary)' % query.encode('utf-8')
+
+        if file is None:
+            # The COPY data does not describe its columns, so ask the server
+            # the first time, and remember them with the other descriptions.
+            cache = self.conn.description_cache
+            description = cache.get(copy)
+            if description is None:
+                result = pgconn.prepare('', query, 0, None)
+                result.check_cmd_result()
                 result.clear()
-            result = self.execute(operation, params)
+                result = pgconn.describe_prepared('')
+                result.check_cmd_result()
+                self._set_result(result)
+                self._free_result()
+                description = self._description
+                cache.put(copy, description)
+            self._description = description
+
+        result = pgconn.exec_params(copy, *NO_PARAMS, 1)
+        if result.status() != libpq.PGRES_COPY_OUT:
+            pgconn.drain()
+            result.check_cmd_result()
+            raise InterfaceError('Expected COPY OUT, got %s' % result.status_text())
+        result.clear()
+
+        # Identifies this COPY to the generator decoding it
+        self._copying = copying = object()
+        self.conn._stream = self
+        if file is None:
+            return self._copy_rows(
+                copying, [desc.cast_func for desc in description], self.tzinfo,
+            )
+
+        try:
+            while True:
+                data = pgconn.get_copy_data()
+                if data is None:
+                    break
+                file.write(data)
+        except:
+            self._end_stream()
+            raise
+        self._copy_end()
+
+    def _copy_end(self):
+        '''
+        Collect the final result of a COPY TO.
+        '''
+        pgconn = self.conn.conn
+        self._copying = False
+        self.conn._stream = None
+        result = pgconn.get_result()
+        pgconn.drain()
+        result.check_cmd_result()
+        count = result.cmd_tuples()
+        self._rowcount = int(count) if count else -1
+        result.clear()
+
+    def _copy_rows(self, copying, column_types, tzinfo):
+        '''
+        Decode the rows of a binary COPY TO as they arrive, in batches of
+        .copy_batch_size.
 
-        # Need a hook for this
-        if result is not None:
-            self._set_result(result)
+        The rows stop if the cursor goes on to anything other than the COPY
+        identified by copying.
+        '''
+        pgconn = self.conn.conn
+        unpack_from = struct.unpack_from
+        batch_size = self.copy_batch_size
+
+        buf = b''
+        chunks = []
+        header = True
+        done = False
+        try:
+            while not done and self._copying is copying:
+                data = pgconn.get_copy_data()
+                if data is None:
+                    self._copy_end()
+                    done = True
+                else:
+                    # Each chunk holds about a row, so they are gathered to
+                    # decode the rows a batch at a time
+                    chunks.append(data)
+                    if len(chunks) < batch_size:
+                        continue
+                buf = b''.join([buf, *chunks])
+                chunks = []
+                pos = 0
+                if header:
+                    # Skip the signature, flags and header extension
+                    if len(buf) < 19 or len(buf) < 19 + unpack_from('!i', buf, 15)[0]:
+                        continue
+                    pos = 19 + unpack_from('!i', buf, 15)[0]
+                    header = False
+                try:
+                    rows, pos = parse_copy_rows(buf, pos, column_types, tzinfo)
+                except types.TypeLookupNeeded as exc:
+                    # The types can not be looked up while the rows are arriving
+                    raise TypeError('Unknown type for value: %r' % exc.oid) from None
+                buf = buf[pos:]
+                for row in rows:
+                    if not done and self._copying is not copying:
+                        # The rest of the batch was abandoned too
+                        return
+                    yield row
+        finally:
+            # If we were abandoned part way
+            if self._copying is copying:
+                self._end_stream()
 
     def fetchone(self):
         '''
@@ -329,27 +1332,17 @@ class Cursor(object):
         An Error (or subclass) exception is raised if the previous call to
         .execute*() did not produce any result set or no call was issued yet.
         '''
-        if not self._result:
-            return None
-
+        while self._resultrow + 1 >= self._ntuples:
+            if not self._next_chunk(self.arraysize):
+                return None
         self._resultrow += 1
-        if self._resultrow >= self._rowcount:
-            self._free_result()
-            return None
-        rownum = self._resultrow
 
-        tzinfo = self.tzinfo
-
-        rec = []
-        for idx, desc in enumerate(self._description):
-            val = self._result.get_value(rownum, idx)
-            vlen = self._result.get_length(rownum, idx)
-            if self._result.get_isnull(rownum, idx):
-                val = None
-            else:
-                val = desc.cast_func.parse(val, vlen, tzinfo)
-            rec.append(val)
-        return tuple(rec)
+        seen = None
+        while True:
+            try:
+                return self._decode_row(self._result, self._resultrow, self.tzinfo)
+            except types.TypeLookupNeeded as exc:
+                seen = self._lookup_type(exc, seen)
 
     def fetchmany(self, size=None):
         '''
@@ -373,13 +1366,7 @@ class Cursor(object):
         '''
         if size is None:
             size = self.arraysize
-        result = []
-        for _ in range(size):
-            row = self.fetchone()
-            if row is None:
-                break
-            result.append(row)
-        return result
+        return self._fetch_rows(size)
 
     def fetchall(self):
         '''
@@ -390,13 +1377,62 @@ class Cursor(object):
         An Error (or subclass) exception is raised if the previous call to
         .execute*() did not produce any result set or no call was issued yet.
         '''
-        return [row for row in self]
-        result = []
-        row = self.fetchone()
-        while(row):
-            result.append(row)
-            row = self.fetchone()
-        return result
+        return self._fetch_rows()
+
+    def _fetch_rows(self, count=None):
+        '''
+        Decode up to count rows (or all remaining rows) from the current
+        result.
+
+        Rather than going cell by cell, this pulls each column out of the
+        result in one pass and lets its type decode the whole column at once,
+        before zipping the columns back into rows.
+        '''
+        rows = []
+        while count is None or len(rows) < count:
+            start = self._resultrow + 1
+            stop = self._ntuples
+            if count is not None:
+                stop = min(stop, start + count - len(rows))
+            if start >= stop:
+                if not self._next_chunk(None if count is None else count - len(rows)):
+                    break
+                continue
+            self._resultrow = stop - 1
+
+            seen = None
+            while True:
+                try:
+                    columns = self._decode_columns(start, stop)
+                    break
+                except types.TypeLookupNeeded as exc:
+                    seen = self._lookup_type(exc, seen)
+
+            if columns:
+                rows.extend(zip(*columns))
+            else:
+                rows.extend([()] * (stop - start))
+        return rows
+
+    def _decode_columns(self, start, stop):
+        '''
+        Decode rows start to stop of the current result, column by column.
+        '''
+        result = self._result
+        tzinfo = self.tzinfo
+        dictionaries = self._text_dictionaries
+        columns = []
+        for idx, desc in enumerate(self._description):
+            cast_func = desc.cast_func
+            if issubclass(cast_func, types.BinaryType) and cast_func.zero_copy:
+                values = result.get_views(idx, start, stop)
+            else:
+                values = result.get_column(idx, start, stop, cast_func.size)
+            if dictionaries and dictionaries[idx] is not None:
+                columns.append(dictionaries[idx].decode_column(values))
+            else:
+                columns.append(cast_func.parse_column(values, tzinfo))
+        return columns
 
     def nextset(self):
         '''
@@ -413,7 +1449,14 @@ class Cursor(object):
         An Error (or subclass) exception is raised if the previous call to
         .execute*() did not produce any result set or no call was issued yet.
         '''
-        raise NotImplementedError
+        if self._rowcount is None:
+            raise InterfaceError('No result set to move on from.')
+        if not self._nextsets:
+            return None
+        nextsets, self._nextsets = self._nextsets, []
+        self._set_result(*nextsets.pop(0))
+        self._nextsets = nextsets
+        return True
 
     def _get_arraysize(self):
         '''
@@ -449,8 +1492,15 @@ class Cursor(object):
 
         Implementations are free to have this method do nothing and users are
         free to not use it.
+
+        The declared types apply to the next .execute*() call only, and are
+        ignored if it has a different number of parameters. Integers and None
+        are treated as undeclared.
         '''
-        raise NotImplementedError
+        if sizes is None:
+            self._formatters = None
+        else:
+            self._formatters = [types.get_formatter(kind) for kind in sizes]
 
     def setoutputsize(self, size, column=None):
         '''
@@ -465,3 +1515,115 @@ class Cursor(object):
         free to not use it.
         '''
         raise NotImplementedError
+
+
+class NamedCursor(Cursor):
+    '''
+    A server side cursor.
+
+    The query is DECLAREd as a cursor on the server, and rows are FETCHed from
+    it in batches as they are consumed: .arraysize rows at a time when
+    iterating or using .fetchone(), the requested number for .fetchmany(), and
+    all remaining rows for .fetchall().
+
+    Unless declared WITH HOLD, the cursor only lives until the end of the
+    transaction.
+    '''
+    def __init__(self, conn, name, withhold=False):
+        self.name = name
+        self.withhold = withhold
+        self._declare = None
+        self._fetched = 0
+        super().__init__(conn)
+
+    @property
+    def _quoted_name(self):
+        return '"%s"' % self.name.replace('"', '""')
+
+    @property
+    def description(self):
+        # Before the first FETCH, ask the server to describe the portal.
+        if self._description is None and self._declare is not None and not self._fetched:
+            result = self.conn.conn.describe_portal(self.name)
+            result.check_cmd_result()
+            self._set_result(result, self._declare)
+        return self._description
+
+    def close(self):
+        if self.conn and self.conn.conn:
+            self._close_portal()
+        super().close()
+
+    def _close_portal(self):
+        '''
+        CLOSE the server side cursor, if it still exists.
+        '''
+        if self._declare is None:
+            return
+        self._declare = None
+        self._cleanup()
+        txn_state = self.conn.conn.transaction_status()
+        if txn_state == libpq.PQTRANS_INTRANS or (self.withhold and txn_state == libpq.PQTRANS_IDLE):
+            result = self.conn.conn.execute('CLOSE %s' % self._quoted_name)
+            result.check_cmd_result()
+
+    @requires_connection
+    def execute(self, operation, parameters=None):
+        '''
+        DECLARE a server side cursor for the operation.
+
+        No rows are read until they are fetched.
+        '''
+        self._close_portal()
+        operation, params = self._prepare(operation, parameters, self._take_formatters())
+        self._begin()
+
+        declare = 'DECLARE %s BINARY CURSOR %s FOR ' % (
+            self._quoted_name,
+            'WITH HOLD' if self.withhold else 'WITHOUT HOLD',
+        )
+        declare = declare.encode('utf-8') + operation
+        result = self.conn.conn.exec_params(declare, *params, 1)
+        result.check_cmd_result()
+        result.clear()
+
+        self._declare = declare
+        self._fetched = 0
+        self._rowcount = -1
+
+    def executemany(self, operation, seq_of_parameters):
+        raise InterfaceError('executemany can not be used with a named cursor.')
+
+    def execute_stream(self, operation, parameters=None):
+        raise InterfaceError('execute_stream can not be used with a named cursor.')
+
+    def _next_chunk(self, size=None):
+        '''
+        FETCH the next batch of rows from the server.
+        '''
+        self._free_result()
+        if self._declare is None or self._rowcount != -1:
+            return False
+
+        if size is None:
+            fetch = 'FETCH ALL FROM %s' % self._quoted_name
+        else:
+            fetch = 'FETCH FORWARD %d FROM %s' % (max(size, 1), self._quoted_name)
+        result = self.conn.conn.exec_params(fetch.encode('utf-8'), *NO_PARAMS, 1)
+        result.check_cmd_result()
+
+        ntuples = result.ntuples()
+        if not ntuples:
+            result.clear()
+            self._rowcount = self._fetched
+            return False
+
+        if self._description is None:
+            self._set_result(result, self._declare)
+        else:
+            self._result = result
+            self._ntuples = ntuples
+            self._resultrow = -1
+        self._fetched += ntuples
+        self._rowcount = -1
+        return True
@@ -1,3 +1,5 @@
+import threading
+
 from django.core.exceptions import ImproperlyConfigured
 from django.db.backends.base.base import BaseDatabaseWrapper
 
@@ -87,6 +89,10 @@ class DatabaseWrapper(BaseDatabaseWrapper):
     introspection_class = DatabaseIntrospection
     ops_class = DatabaseOperations
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._named_cursor_idx = 0
+
     def get_new_connection(self, conn_params):
         connection = Database.connect(**conn_params)
         with connection.cursor() as cur:
@@ -121,10 +127,25 @@ class DatabaseWrapper(BaseDatabaseWrapper):
         return conn_params
 
     def create_cursor(self, name=None):
-        cursor = self.connection.cursor()
+        if name:
+            # In autocommit mode, the cursor will be used outside of a
+            # transaction, hence use a holdable cursor.
+            cursor = self.connection.cursor(name, withhold=self.connection._autocommit)
+        else:
+            cursor = self.connection.cursor()
         cursor.tzinfo = utc if settings.USE_TZ else None
         return cursor
 
+    def chunked_cursor(self):
+        self._named_cursor_idx += 1
+        return self._cursor(
+            name='_django_curs_%d_%d' % (
+                # Avoid reusing name in other threads
+                threading.current_thread().ident,
+                self._named_cursor_idx,
+            )
+        )
+
     def is_usable(self):
         try:
             # Use a psycopg cursor directly, bypassing Django's utilities.
@@ -3,5 +3,7 @@ from django.db.backends.postgresql.features import DatabaseFeatures as _Database
 
 class DatabaseFeatures(_DatabaseFeatures):
     supports_paramstyle_pyformat = False
+    # Named cursors stream rows with DECLARE/FETCH
+    can_use_chunked_reads = True
     # TEMPORARY!
     has_jsonb_datatype = False
@@ -1,5 +1,5 @@
 
-from ctypes import cdll, c_int, c_uint, Structure, POINTER, c_char_p, c_char, c_size_t
+from ctypes import cdll, c_int, c_uint, Structure, POINTER, c_char_p, c_char, c_size_t, c_void_p
 from ctypes.util import find_library
 
 libpq = cdll.LoadLibrary(find_library('pq'))
@@ -36,6 +36,13 @@ PGRES_NONFATAL_ERROR = 6    # notice or warning message
 PGRES_FATAL_ERROR = 7       # query failed
 PGRES_COPY_BOTH = 8         # Copy In/Out data transfer in progress
 PGRES_SINGLE_TUPLE = 9      # single tuple from larger resultset
+PGRES_PIPELINE_SYNC = 10    # pipeline synchronization point
+PGRES_PIPELINE_ABORTED = 11 # Command didn't run because of an abort
+                            # earlier in a pipeline
+PGRES_TUPLES_CHUNK = 12     # chunk of tuples from larger resultset
+
+# Statuses of the partial results returned while streaming rows
+STREAM_STATUSES = (PGRES_SINGLE_TUPLE, PGRES_TUPLES_CHUNK)
 
 ExecStatusType = c_int
 
@@ -97,6 +104,21 @@ PQstatus = libpq.PQstatus
 PQstatus.argtypes = [PGconn_p]
 PQstatus.restype = ConnStatusType
 
+# char *PQdb(const PGconn *conn);
+PQdb = libpq.PQdb
+PQdb.argtypes = [PGconn_p]
+PQdb.restype = c_char_p
+
+# char *PQhost(const PGconn *conn);
+PQhost = libpq.PQhost
+PQhost.argtypes = [PGconn_p]
+PQhost.restype = c_char_p
+
+# char *PQport(const PGconn *conn);
+PQport = libpq.PQport
+PQport.argtypes = [PGconn_p]
+PQport.restype = c_char_p
+
 # PGresult *PQexec(PGconn *conn, const char *command);
 PQexec = libpq.PQexec
 PQexec.argtypes = [PGconn_p, c_char_p]
@@ -207,7 +229,7 @@ PQgetisnull.restype = c_int
 #                 int field_num);
 PQgetlength = libpq.PQgetlength
 PQgetlength.argtypes = [PGresult_p, c_int, c_int]
-PQgetisnull.restype = c_int
+PQgetlength.restype = c_int
 
 
 # char *PQresultErrorMessage(const PGresult *res);
@@ -251,3 +273,158 @@ PQcmdStatus.restype = c_char_p
 PQresStatus = libpq.PQresStatus
 PQresStatus.argtypes = [c_int]
 PQresStatus.restype = c_char_p
+
+
+# int PQsendQueryParams(PGconn *conn,
+#                       const char *command,
+#                       int nParams,
+#                       const Oid *paramTypes,
+#                       const char * const *paramValues,
+#                       const int *paramLengths,
+#                       const int *paramFormats,
+#                       int resultFormat);
+PQsendQueryParams = libpq.PQsendQueryParams
+PQsendQueryParams.argtypes = [PGconn_p,
+                              c_char_p,
+                              c_int,
+                              POINTER(Oid),
+                              POINTER(c_char_p),
+                              POINTER(c_int),
+                              POINTER(c_int),
+                              c_int,
+                              ]
+PQsendQueryParams.restype = c_int
+
+# PGresult *PQgetResult(PGconn *conn);
+PQgetResult = libpq.PQgetResult
+PQgetResult.argtypes = [PGconn_p]
+PQgetResult.restype = PGresult_p
+
+# int PQsocket(const PGconn *conn);
+PQsocket = libpq.PQsocket
+PQsocket.argtypes = [PGconn_p]
+PQsocket.restype = c_int
+
+# int PQsetnonblocking(PGconn *conn, int arg);
+PQsetnonblocking = libpq.PQsetnonblocking
+PQsetnonblocking.argtypes = [PGconn_p, c_int]
+PQsetnonblocking.restype = c_int
+
+# int PQflush(PGconn *conn);
+PQflush = libpq.PQflush
+PQflush.argtypes = [PGconn_p]
+PQflush.restype = c_int
+
+# int PQconsumeInput(PGconn *conn);
+PQconsumeInput = libpq.PQconsumeInput
+PQconsumeInput.argtypes = [PGconn_p]
+PQconsumeInput.restype = c_int
+
+# int PQsetSingleRowMode(PGconn *conn);
+PQsetSingleRowMode = libpq.PQsetSingleRowMode
+PQsetSingleRowMode.argtypes = [PGconn_p]
+PQsetSingleRowMode.restype = c_int
+
+# int PQsetChunkedRowsMode(PGconn *conn, int chunkSize);
+# Added in libpq 17
+HAS_CHUNKED_ROWS = hasattr(libpq, 'PQsetChunkedRowsMode')
+if HAS_CHUNKED_ROWS:
+    PQsetChunkedRowsMode = libpq.PQsetChunkedRowsMode
+    PQsetChunkedRowsMode.argtypes = [PGconn_p, c_int]
+    PQsetChunkedRowsMode.restype = c_int
+
+# PGresult *PQdescribePortal(PGconn *conn, const char *portalName);
+PQdescribePortal = libpq.PQdescribePortal
+PQdescribePortal.argtypes = [PGconn_p, c_char_p]
+PQdescribePortal.restype = PGresult_p
+
+# PGresult *PQprepare(PGconn *conn,
+#                     const char *stmtName,
+#                     const char *query,
+#                     int nParams,
+#                     const Oid *paramTypes);
+PQprepare = libpq.PQprepare
+PQprepare.argtypes = [PGconn_p, c_char_p, c_char_p, c_int, POINTER(Oid)]
+PQprepare.restype = PGresult_p
+
+# PGresult *PQexecPrepared(PGconn *conn,
+#                          const char *stmtName,
+#                          int nParams,
+#                          const char * const *paramValues,
+#                          const int *paramLengths,
+#                          const int *paramFormats,
+#                          int resultFormat);
+PQexecPrepared = libpq.PQexecPrepared
+PQexecPrepared.argtypes = [PGconn_p,
+                           c_char_p,
+                           c_int,
+                           POINTER(c_char_p),
+                           POINTER(c_int),
+                           POINTER(c_int),
+                           c_int,
+                           ]
+PQexecPrepared.restype = PGresult_p
+
+# Pipeline mode was added in libpq 14
+HAS_PIPELINE = hasattr(libpq, 'PQenterPipelineMode')
+if HAS_PIPELINE:
+    # int PQenterPipelineMode(PGconn *conn);
+    PQenterPipelineMode = libpq.PQenterPipelineMode
+    PQenterPipelineMode.argtypes = [PGconn_p]
+    PQenterPipelineMode.restype = c_int
+
+    # int PQexitPipelineMode(PGconn *conn);
+    PQexitPipelineMode = libpq.PQexitPipelineMode
+    PQexitPipelineMode.argtypes = [PGconn_p]
+    PQexitPipelineMode.restype = c_int
+
+    # int PQpipelineSync(PGconn *conn);
+    PQpipelineSync = libpq.PQpipelineSync
+    PQpipelineSync.argtypes = [PGconn_p]
+    PQpipelineSync.restype = c_int
+
+# int PQputCopyData(PGconn *conn,
+#                   const char *buffer,
+#                   int nbytes);
+PQputCopyData = libpq.PQputCopyData
+PQputCopyData.argtypes = [PGconn_p, c_char_p, c_int]
+PQputCopyData.restype = c_int
+
+# int PQputCopyEnd(PGconn *conn,
+#                  const char *errormsg);
+PQputCopyEnd = libpq.PQputCopyEnd
+PQputCopyEnd.argtypes = [PGconn_p, c_char_p]
+PQputCopyEnd.restype = c_int
+
+# int PQgetCopyData(PGconn *conn, char **buffer, int async);
+PQgetCopyData = libpq.PQgetCopyData
+PQgetCopyData.argtypes = [PGconn_p, POINTER(c_void_p), c_int]
+PQgetCopyData.restype = c_int
+
+# void PQfreemem(void *ptr);
+PQfreemem = libpq.PQfreemem
+PQfreemem.argtypes = [c_void_p]
+PQfreemem.restype = None
+
+# PGresult *PQdescribePrepared(PGconn *conn, const char *stmtName);
+PQdescribePrepared = libpq.PQdescribePrepared
+PQdescribePrepared.argtypes = [PGconn_p, c_char_p]
+PQdescribePrepared.restype = PGresult_p
+
+# int PQsendQueryPrepared(PGconn *conn,
+#                         const char *stmtName,
+#                         int nParams,
+#                         const char * const *paramValues,
+#                         const int *paramLengths,
+#                         const int *paramFormats,
+#                         int resultFormat);
+PQsendQueryPrepared = libpq.PQsendQueryPrepared
+PQsendQueryPrepared.argtypes = [PGconn_p,
+                                c_char_p,
+                                c_int,
+                                POINTER(c_char_p),
+                                POINTER(c_int),
+                                POINTER(c_int),
+                                c_int,
+                                ]
+PQsendQueryPrepared.restype = c_int
@@ -0,0 +1,248 @@
+'''
+Types which are not built in to postgres, such as enums and domains, have
+OIDs which vary between databases. They are looked up in pg_type the first
+time they are seen, and remembered for every connection to that database.
+'''
+import json
+import os
+import tempfile
+import threading
+
+from ctypes import c_char_p
+
+from . import libpq, types
+
+
+TYPE_QUERY = b'''
+SELECT t.oid::int8, t.typtype,
+       COALESCE((SELECT r.rngsubtype FROM pg_range r WHERE r.rngtypid = t.oid), t.typbasetype)::int8,
+       t.typelem::int8, t.typcategory,
+       t.typname::text,
+       array(
+           SELECT a.attname::text
+             FROM pg_attribute a
+            WHERE a.attrelid = t.typrelid AND a.attnum > 0 AND NOT a.attisdropped
+            ORDER BY a.attnum
+       ),
+       array(
+           SELECT a.atttypid::int8
+             FROM pg_attribute a
+            WHERE a.attrelid = t.typrelid AND a.attnum > 0 AND NOT a.attisdropped
+            ORDER BY a.attnum
+       )
+  FROM pg_type t
+ WHERE t.oid = ANY($1::oid[])
+'''
+
+_registries = {}
+_lock = threading.Lock()
+
+
+def get_registry(key, path=None):
+    '''
+    Return the TypeRegistry shared by connections to the database identified
+    by key.
+    '''
+    with _lock:
+        try:
+            return _registries[key]
+        except KeyError:
+            registry = _registries[key] = TypeRegistry(key, path)
+            return registry
+
+
+class TypeRegistry(object):
+    '''
+    The types of a database, resolving those which are not built in from the
+    pg_type rows describing them.
+
+    If path is given, the rows are saved to that JSON file, and loaded from
+    it when the registry is created. It may be shared by several databases.
+    '''
+    def __init__(self, key, path=None):
+        self.key = key
+        self.path = path
+        # oid -> (typtype, typbasetype or the subtype of a range, typelem,
+        #         typcategory, typname, attribute names, attribute types)
+        self.rows = {}
+        self.types = {}
+        self._arrays = {}
+        self._ranges = {}
+        # Anonymous records, which look their fields up here
+        self.record_type = type('Record', (types.RecordType,), {'oid': None, 'registry': self})
+        if path is not None:
+            self.load()
+
+    def lookup(self, pgconn, oids):
+        '''
+        Return the type for each of oids, or None for those which can not be
+        decoded.
+
+        Unknown OIDs are looked up on pgconn, unless it is busy with another
+        query.
+        '''
+        missing = [oid for oid in oids if self.get(oid) is None and oid not in self.rows]
+        if missing and pgconn.transaction_status() != libpq.PQTRANS_ACTIVE:
+            self.fetch(pgconn, missing)
+        return [self.get(oid) for oid in oids]
+
+    def get(self, oid):
+        try:
+            kind = types.BaseType._oid[oid]
+        except KeyError:
+            pass
+        else:
+            if kind is types.RecordType:
+                return self.record_type
+            if kind is types.RecordArrayType:
+                return self.array_type(self.record_type, kind.element_oid)
+            return kind
+        try:
+            return self.types[oid]
+        except KeyError:
+            pass
+        kind = self.resolve(oid)
+        if kind is not None:
+            self.types[oid] = kind
+        return kind
+
+    def resolve(self, oid):
+        '''
+        Find the type for oid from its pg_type row.
+        '''
+        try:
+            typtype, basetype, elem, category, name, attnames, atttypes = self.rows[oid]
+        except KeyError:
+            return None
+        if typtype == 'd':
+            return self.get(basetype)
+        if typtype == 'c':
+            field_types = [self.get(atttype) for atttype in atttypes]
+            if None in field_types:
+                return None
+            return types.RecordType.composite(name, attnames, field_types, oid, atttypes)
+        if typtype == 'r':
+            element = self.get(basetype)
+            if element is None:
+                return None
+            return self.range_type(element)
+        if typtype == 'e':
+            return types.StringType
+        if category == 'A' and elem:
+            element = self.get(elem)
+            if element is None:
+                return None
+            return self.array_type(element, elem)
+        if category == 'S':
+            return types.StringType
+        return None
+
+    def array_type(self, element, element_oid):
+        '''
+        Return an ArrayType for arrays of element, which postgres labels with
+        element_oid.
+        '''
+        try:
+            return self._arrays[element_oid]
+        except KeyError:
+            kind = self._arrays[element_oid] = type(
+                '%sArray' % element.__name__, (types.ArrayType,),
+                {'element': element, 'element_oid': element_oid},
+            )
+            return kind
+
+    def range_type(self, element):
+        '''
+        Return a RangeType for ranges of element.
+        '''
+        try:
+            return self._ranges[element]
+        except KeyError:
+            kind = self._ranges[element] = type(
+                '%sRange' % element.__name__, (types.RangeType,), {'oid': None, 'element': element},
+            )
+            return kind
+
+    def refresh(self, pgconn, oid):
+        '''
+        Look up oid again, as a value has been found to hold one, or to not
+        match the pg_type row we have for it, while decoding.
+
+        The types made from the old rows are forgotten, as they may include
+        it. Returns False if pgconn is busy with another query.
+        '''
+        if pgconn.transaction_status() == libpq.PQTRANS_ACTIVE:
+            return False
+        self.rows.pop(oid, None)
+        self.fetch(pgconn, [oid])
+        self.types.clear()
+        self._arrays.clear()
+        self._ranges.clear()
+        return True
+
+    def fetch(self, pgconn, oids):
+        '''
+        Load the pg_type rows for oids, and any types they are based on.
+        '''
+        while oids:
+            value = ('{%s}' % ','.join(map(str, oids))).encode('utf-8')
+            result = pgconn.exec_params(TYPE_QUERY, 1, None, (c_char_p * 1)(value), None, None, 1)
+            result.check_cmd_result()
+            ntuples = result.ntuples()
+            columns = [result.get_column(field, 0, ntuples) for field in range(8)]
+            result.clear()
+
+            found = {}
+            parse_int = types.LongType.parse
+            parse_text = types.StringType.parse
+            for oid, typtype, basetype, elem, category, name, attnames, atttypes in zip(*columns):
+                found[parse_int(oid, 8, None)] = (
+                    typtype.decode('utf-8'),
+                    parse_int(basetype, 8, None),
+                    parse_int(elem, 8, None),
+                    category.decode('utf-8'),
+                    parse_text(name, len(name), None),
+                    types.TextArray.parse(attnames, len(attnames), None),
+                    types.Int8ArrayType.parse(atttypes, len(atttypes), None),
+                )
+            self.rows.update(found)
+
+            oids = [
+                ref
+                for row in found.values()
+                for ref in [row[1], row[2]] + row[6]
+                if ref and ref not in types.BaseType._oid and ref not in self.rows
+            ]
+        if self.path is not None:
+            self.save()
+
+    def load(self):
+        try:
+            with open(self.path) as fh:
+                data = json.load(fh)
+        except (OSError, ValueError):
+            return
+        for oid, row in data.get(self.key, {}).items():
+            if len(row) == 7:
+                self.rows[int(oid)] = tuple(row)
+
+    def save(self):
+        '''
+        Write our rows to the file, keeping those of other databases, and
+        replacing it atomically so concurrent workers never see a partial file.
+        '''
+        with _lock:
+            try:
+                with open(self.path) as fh:
+                    data = json.load(fh)
+            except (OSError, ValueError):
+                data = {}
+            data[self.key] = {str(oid): row for oid, row in self.rows.items()}
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)))
+            try:
+                with os.fdopen(fd, 'w') as fh:
+                    json.dump(data, fh)
+                os.replace(tmp, self.path)
+            except BaseException:
+                os.unlink(tmp)
+                raise
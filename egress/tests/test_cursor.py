@@ -0,0 +1,932 @@
+'''
+Tests for fetching rows through the cursor
+'''
+
+import datetime
+import io
+import os
+import tempfile
+import unittest
+
+from decimal import Decimal
+from unittest import mock
+
+import egress as db
+from egress import libpq, types
+from egress.cursor import split_statements
+from egress.registry import TypeRegistry
+from egress.tests.config import DATABASE
+
+
+def connect():
+    connection = db.connect(**DATABASE)
+    connection._autocommit = True
+    return connection
+
+
+class TestFetch(unittest.TestCase):
+    '''
+    The bulk fetch paths must agree with fetchone.
+    '''
+    query = '''
+    SELECT i::int2, i::int4, i::int8, i::float8, i %% 2 = 0,
+           '2000-01-01'::date + i, 'x' || i,
+           CASE WHEN i %% 3 = 0 THEN NULL ELSE i END
+      FROM generate_series(1, 10) i
+    '''
+
+    def setUp(self):
+        self.connection = connect()
+        self.cursor = self.connection.cursor()
+
+    def tearDown(self):
+        self.connection.close()
+
+    def fetch_by_row(self):
+        self.cursor.execute(self.query, [])
+        rows = []
+        while True:
+            row = self.cursor.fetchone()
+            if row is None:
+                return rows
+            rows.append(row)
+
+    def test_fetchall(self):
+        expected = self.fetch_by_row()
+        self.cursor.execute(self.query, [])
+        self.assertEqual(self.cursor.fetchall(), expected)
+        self.assertEqual(self.cursor.fetchall(), [])
+
+    def test_fetchmany(self):
+        expected = self.fetch_by_row()
+        self.cursor.execute(self.query, [])
+        rows = self.cursor.fetchmany(4)
+        self.assertEqual(len(rows), 4)
+        rows.append(self.cursor.fetchone())
+        rows.extend(self.cursor.fetchmany(100))
+        self.assertEqual(rows, expected)
+        self.assertEqual(self.cursor.fetchmany(4), [])
+
+    def test_values(self):
+        self.cursor.execute(self.query, [])
+        rows = self.cursor.fetchall()
+        self.assertEqual(
+            rows[2],
+            (3, 3, 3, 3.0, False, datetime.date(2000, 1, 4), 'x3', None),
+        )
+
+    def test_row_decoder_reused(self):
+        self.cursor.execute('SELECT 1::int4, %s::text', [1])
+        decoder = self.cursor._decode_row
+        self.cursor.execute('SELECT 2::int4, %s::text', ['x'])
+        self.assertIs(self.cursor._decode_row, decoder)
+        self.assertEqual(self.cursor.fetchone(), (2, 'x'))
+
+    def test_description_cache(self):
+        cache = self.connection.description_cache
+        hits, misses = cache.hits, cache.misses
+        self.cursor.execute('SELECT 1::int4 AS a, %s::text AS b', [1])
+        description = self.cursor.description
+        self.assertEqual((cache.hits, cache.misses), (hits, misses + 1))
+        self.cursor.execute('SELECT 1::int4 AS a, %s::text AS b', [2])
+        self.assertEqual((cache.hits, cache.misses), (hits + 1, misses + 1))
+        self.assertIs(self.cursor.description, description)
+        self.assertEqual([d.name for d in description], ['a', 'b'])
+
+    def test_description_renamed(self):
+        self.cursor.execute('CREATE TEMPORARY TABLE fetch_renamed (a int4)')
+        self.cursor.execute('SELECT * FROM fetch_renamed')
+        self.assertEqual([d.name for d in self.cursor.description], ['a'])
+        self.cursor.execute('ALTER TABLE fetch_renamed RENAME COLUMN a TO b')
+        self.cursor.execute('SELECT * FROM fetch_renamed')
+        self.assertEqual([d.name for d in self.cursor.description], ['b'])
+
+
+class TestTextDictionary(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = connect()
+        self.cursor = self.connection.cursor()
+        self.cursor.text_dictionary_size = 16
+
+    def tearDown(self):
+        self.cursor.close()
+        self.connection.close()
+
+    def test_shared(self):
+        self.cursor.execute(
+            "SELECT 'status' || (x %% 5), x, CASE WHEN x > 1 THEN 'a'::varchar END"
+            " FROM generate_series(1, 100) x"
+        )
+        rows = self.cursor.fetchmany(10) + self.cursor.fetchall()
+        self.assertEqual([row[0] for row in rows[:6]], ['status1', 'status2', 'status3', 'status4', 'status0', 'status1'])
+        self.assertIs(rows[0][0], rows[95][0])
+        self.assertIs(rows[1][2], rows[99][2])
+        self.assertIsNone(rows[0][2])
+        dictionary = self.cursor._text_dictionaries[0]
+        self.assertEqual((dictionary.hits, dictionary.misses), (95, 5))
+
+    def test_name(self):
+        self.cursor.execute("SELECT ''::name, 'a'::name")
+        self.assertEqual(self.cursor.fetchall(), [(None, 'a')])
+        self.assertIsNone(self.cursor._text_dictionaries)
+
+    def test_bypass(self):
+        self.cursor.execute('SELECT md5(x::text) FROM generate_series(1, 2000) x')
+        rows = self.cursor.fetchall()
+        self.assertEqual(len(set(rows)), 2000)
+        self.assertTrue(self.cursor._text_dictionaries[0].bypass)
+
+
+class TestTemporal(unittest.TestCase):
+
+    QUERY = (
+        "SELECT 'infinity'::timestamp, '-infinity'::timestamptz, 'infinity'::date,"
+        " '2020-06-01 12:00:00.000001+00'::timestamptz, '1999-12-31'::date"
+    )
+
+    def setUp(self):
+        self.connection = connect()
+        self.cursor = self.connection.cursor()
+
+    def tearDown(self):
+        self.cursor.close()
+        self.connection.close()
+
+    def test_infinity(self):
+        expected = (
+            datetime.datetime.max,
+            datetime.datetime.min,
+            datetime.date.max,
+            datetime.datetime(2020, 6, 1, 12, 0, 0, 1),
+            datetime.date(1999, 12, 31),
+        )
+        self.cursor.execute(self.QUERY)
+        self.assertEqual(self.cursor.fetchone(), expected)
+        self.cursor.execute(self.QUERY)
+        self.assertEqual(self.cursor.fetchall(), [expected])
+
+        # Real values at the ends of the range are not sent as infinity
+        self.cursor.execute(
+            'SELECT %s::text, %s::text, %s::text',
+            [datetime.datetime.max, datetime.datetime.min, datetime.date.max],
+        )
+        self.assertEqual(
+            self.cursor.fetchone(),
+            ('9999-12-31 23:59:59.999999+00', '0001-01-01 00:00:00+00', '9999-12-31'),
+        )
+
+    def test_tzinfo(self):
+        tzinfo = datetime.timezone(datetime.timedelta(hours=2))
+        self.cursor.tzinfo = tzinfo
+        value = datetime.datetime(2020, 6, 1, 14, 0, 0, 1, tzinfo=tzinfo)
+        self.cursor.execute(self.QUERY)
+        row = self.cursor.fetchone()
+        self.assertEqual(row[3], value)
+        self.assertEqual(row[3].utcoffset(), datetime.timedelta(hours=2))
+        self.cursor.execute(self.QUERY)
+        row = self.cursor.fetchall()[0]
+        self.assertEqual((row[1], row[3]), (datetime.datetime.min.replace(tzinfo=tzinfo), value))
+
+        self.cursor.execute('SELECT %s::text', [value])
+        self.assertEqual(self.cursor.fetchone(), ('2020-06-01 12:00:00.000001+00',))
+
+
+class TestZeroCopy(unittest.TestCase):
+
+    def setUp(self):
+        types.BinaryType.zero_copy = True
+        self.connection = connect()
+        self.cursor = self.connection.cursor()
+
+    def tearDown(self):
+        types.BinaryType.zero_copy = False
+        self.cursor.close()
+        self.connection.close()
+
+    def test_views(self):
+        query = "SELECT decode(repeat('ab', i), 'hex'), NULL::bytea FROM generate_series(0, 3) i"
+        self.cursor.execute(query)
+        first = self.cursor.fetchone()
+        self.assertIsInstance(first[0], memoryview)
+        self.assertTrue(first[0].readonly)
+        rows = self.cursor.fetchall()
+        self.assertEqual(
+            [(bytes(row[0]), row[1]) for row in [first] + rows],
+            [(b'\xab' * i, None) for i in range(4)],
+        )
+        # The views outlive the result they came from
+        tail = rows[-1][0][1:]
+        self.cursor.execute(query)
+        self.cursor.fetchall()
+        del first, rows
+        self.assertEqual(tail.tobytes(), b'\xab\xab')
+
+    def test_parameters(self):
+        self.cursor.execute("SELECT '\\x0102'::bytea")
+        view = self.cursor.fetchone()[0]
+        self.cursor.execute('SELECT %s::bytea, %s::bytea, %s', [view, bytearray(b'ab'), [memoryview(b'c')]])
+        first, second, third = self.cursor.fetchone()
+        self.assertEqual((bytes(first), bytes(second), [bytes(value) for value in third]), (b'\x01\x02', b'ab', [b'c']))
+
+
+class TestArrays(unittest.TestCase):
+
+    def test_any(self):
+        connection = connect()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT x FROM generate_series(1, 10) x WHERE x = ANY(%s) ORDER BY x',
+                [[7, 2, 5]],
+            )
+            self.assertEqual(cursor.fetchall(), [(2,), (5,), (7,)])
+            cursor.execute("SELECT ARRAY[[1, 2], [3, NULL]]::int8[], '[0:1]={a,b}'::text[], '{}'::int4[]")
+            self.assertEqual(cursor.fetchone(), ([[1, 2], [3, None]], ['a', 'b'], []))
+        connection.close()
+
+
+class TestRanges(unittest.TestCase):
+
+    def test_ranges(self):
+        utc = datetime.timezone.utc
+        start = datetime.datetime(2020, 1, 1, 9, tzinfo=utc)
+        connection = connect()
+        with connection.cursor() as cursor:
+            cursor.tzinfo = utc
+            cursor.execute(
+                "SELECT int4range(1, 10), '(,5]'::int8range, 'empty'::numrange,"
+                " tstzrange(%s, NULL), ARRAY[daterange('2020-01-01', '2020-01-31', '[]')]",
+                [start],
+            )
+            self.assertEqual(cursor.fetchone(), (
+                db.Range(1, 10),
+                db.Range(None, 6, '()'),
+                db.Range(empty=True),
+                db.Range(start, None, '[)'),
+                [db.Range(datetime.date(2020, 1, 1), datetime.date(2020, 2, 1))],
+            ))
+            cursor.execute(
+                "SELECT %s && tstzrange('2020-01-01 10:00Z', '2020-01-01 11:00Z'), %s::int4range",
+                [db.Range(start, start + datetime.timedelta(hours=2)), db.Range(empty=True)],
+            )
+            self.assertEqual(cursor.fetchone(), (True, db.Range(empty=True)))
+        connection.close()
+
+
+class TestJson(unittest.TestCase):
+
+    def test_json(self):
+        connection = connect()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """SELECT '{"a": [1, null]}'::jsonb, '"x"'::json, %s -> 'b', ARRAY['{}'::jsonb]""",
+                [{'b': 2.5}],
+            )
+            self.assertEqual(cursor.fetchone(), ({'a': [1, None]}, 'x', 2.5, [{}]))
+            cursor.setinputsizes([types.JsonbType])
+            cursor.execute('SELECT jsonb_typeof(%s)', [[1, 2]])
+            self.assertEqual(cursor.fetchone(), ('array',))
+        connection.close()
+
+
+class TestTypeRegistry(unittest.TestCase):
+    '''
+    Types which are not built in are looked up in pg_type.
+    '''
+
+    def setUp(self):
+        self.connection = connect()
+        self.cursor = self.connection.cursor()
+        self.cursor.execute(
+            "CREATE TYPE registry_mood AS ENUM ('sad', 'happy');"
+            "CREATE DOMAIN registry_posint AS int4 CHECK (VALUE > 0);"
+            "CREATE DOMAIN registry_moody AS registry_mood;"
+            "CREATE TYPE registry_floatrange AS RANGE (subtype = float8)"
+        )
+
+    def tearDown(self):
+        self.cursor.execute(
+            'DROP TYPE registry_mood CASCADE; DROP DOMAIN registry_posint; DROP TYPE registry_floatrange;'
+            'DROP TYPE IF EXISTS registry_pair'
+        )
+        self.cursor.close()
+        self.connection.close()
+
+    def test_lookup(self):
+        self.cursor.execute(
+            "SELECT 'happy'::registry_mood, 5::registry_posint, 'sad'::registry_moody,"
+            " ARRAY['sad', NULL]::registry_mood[], ARRAY[1, 2]::registry_posint[]"
+        )
+        self.assertEqual(self.cursor.fetchall(), [('happy', 5, 'sad', ['sad', None], [1, 2])])
+
+    def test_range(self):
+        self.cursor.execute("SELECT registry_floatrange(1.5, 2), ARRAY['[,0]'::registry_floatrange]")
+        self.assertEqual(self.cursor.fetchone(), (db.Range(1.5, 2.0), [db.Range(None, 0.0, '(]')]))
+
+    def test_composite(self):
+        self.cursor.execute(
+            'CREATE TEMPORARY TABLE registry_child (id int4, mood registry_mood, tags text[])'
+        )
+        self.cursor.execute(
+            "INSERT INTO registry_child VALUES (1, 'sad', '{a,b}'), (2, NULL, NULL)"
+        )
+        self.cursor.execute(
+            'SELECT array_agg(c ORDER BY id), array_agg(ROW(id, tags) ORDER BY id)'
+            '  FROM registry_child c'
+        )
+        children, records = self.cursor.fetchone()
+        self.assertEqual(children, [(1, 'sad', ['a', 'b']), (2, None, None)])
+        self.assertEqual(children[0].mood, 'sad')
+        self.assertEqual(records, [(1, ['a', 'b']), (2, None)])
+        self.cursor.execute('DROP TABLE registry_child')
+
+    def test_record_fields(self):
+        query = (
+            "SELECT ROW('happy'::registry_mood, 5::registry_posint),"
+            " ARRAY[ROW(registry_floatrange(1, 2)), ROW(NULL::registry_floatrange)]"
+        )
+        self.cursor.execute(query)
+        self.assertEqual(self.cursor.fetchone(), (('happy', 5), [(db.Range(1.0, 2.0),), (None,)]))
+        self.cursor.execute(query)
+        self.assertEqual(self.cursor.fetchall(), [(('happy', 5), [(db.Range(1.0, 2.0),), (None,)])])
+
+    def test_altered_composite(self):
+        self.cursor.execute('CREATE TYPE registry_pair AS (a int4, b text)')
+        self.cursor.execute("SELECT ROW(1, 'x')::registry_pair, ARRAY[ROW(2, 'y')::registry_pair]")
+        self.assertEqual(self.cursor.fetchone(), ((1, 'x'), [(2, 'y')]))
+
+        self.cursor.execute('ALTER TYPE registry_pair ADD ATTRIBUTE c registry_mood')
+        self.cursor.execute("SELECT ROW(1, 'x', 'sad')::registry_pair, ARRAY[ROW(2, 'y', NULL)::registry_pair]")
+        pair, pairs = self.cursor.fetchone()
+        self.assertEqual((pair, pairs), ((1, 'x', 'sad'), [(2, 'y', None)]))
+        self.assertEqual(pair.c, 'sad')
+
+        other = connect()
+        with other.cursor() as cursor:
+            cursor.execute('ALTER TYPE registry_pair DROP ATTRIBUTE b, ALTER ATTRIBUTE a TYPE int8')
+        other.close()
+        self.cursor.execute("SELECT ROW(1, 'happy')::registry_pair, ARRAY[ROW(2, 'sad')::registry_pair]")
+        self.assertEqual(self.cursor.fetchall(), [((1, 'happy'), [(2, 'sad')])])
+
+    def test_shared(self):
+        self.cursor.execute("SELECT 'happy'::registry_mood")
+        other = connect()
+        self.assertIs(other.type_registry, self.connection.type_registry)
+        other.close()
+
+    def test_persist(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'types.json')
+            registry = TypeRegistry('test', path)
+            self.cursor.execute("SELECT 'registry_moody'::regtype::oid::int8")
+            oid = self.cursor.fetchone()[0]
+            self.assertEqual(registry.lookup(self.connection.conn, [oid]), [types.StringType])
+
+            loaded = TypeRegistry('test', path)
+            self.assertEqual(loaded.get(oid), types.StringType)
+
+
+class TestStream(unittest.TestCase):
+    '''
+    Streaming results in single row mode.
+    '''
+    query = 'SELECT i, %s || i FROM generate_series(1, 10) i'
+
+    def setUp(self):
+        self.connection = connect()
+        self.cursor = self.connection.cursor()
+
+    def tearDown(self):
+        self.connection.close()
+
+    def test_stream(self):
+        self.cursor.execute_stream(self.query, ['x'])
+        self.assertEqual(self.cursor.rowcount, -1)
+        self.assertEqual(self.cursor.fetchone(), (1, 'x1'))
+        self.assertEqual(self.cursor.fetchmany(2), [(2, 'x2'), (3, 'x3')])
+        self.assertEqual(len(list(self.cursor)), 7)
+        self.assertEqual(self.cursor.rowcount, 10)
+
+    def test_interrupted(self):
+        self.cursor.execute_stream(self.query, ['x'])
+        self.cursor.fetchone()
+        with self.connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            self.assertEqual(cursor.fetchall(), [(1,)])
+        self.assertIsNone(self.cursor.fetchone())
+
+    def test_error(self):
+        with self.assertRaises(db.DataError):
+            self.cursor.execute_stream('SELECT 1 / (i - 3) FROM generate_series(1, 5) i')
+            self.cursor.fetchall()
+        self.cursor.execute('SELECT 1')
+        self.assertEqual(self.cursor.fetchall(), [(1,)])
+
+
+class TestNamedCursor(unittest.TestCase):
+    '''
+    Server side cursors using DECLARE and FETCH.
+    '''
+    query = 'SELECT i FROM generate_series(1, 10) i'
+
+    def setUp(self):
+        self.connection = db.connect(**DATABASE)
+
+    def tearDown(self):
+        self.connection.close()
+
+    def test_fetch(self):
+        with self.connection.cursor('test_fetch') as cursor:
+            cursor.arraysize = 3
+            cursor.execute(self.query)
+            self.assertEqual(cursor.description[0].name, 'i')
+            self.assertEqual(cursor.fetchone(), (1,))
+            self.assertEqual(cursor.fetchmany(4), [(2,), (3,), (4,), (5,)])
+            self.assertEqual([row[0] for row in cursor], [6, 7, 8, 9, 10])
+            self.assertEqual(cursor.rowcount, 10)
+
+    def test_withhold(self):
+        self.connection._autocommit = True
+        with self.connection.cursor('test_withhold', withhold=True) as cursor:
+            cursor.execute(self.query)
+            self.assertEqual(len(cursor.fetchall()), 10)
+
+
+class TestPreparedStatements(unittest.TestCase):
+    '''
+    Frequently run statements are prepared automatically, when enabled.
+    '''
+    def setUp(self):
+        self.connection = connect()
+        self.connection.prepare_threshold = 2
+        self.connection.statement_cache.maxsize = 2
+        self.cursor = self.connection.cursor()
+
+    def tearDown(self):
+        self.connection.close()
+
+    def prepared(self):
+        self.cursor.execute('SELECT name FROM pg_prepared_statements ORDER BY name')
+        return [row[0] for row in self.cursor.fetchall()]
+
+    def test_prepare(self):
+        cache = self.connection.statement_cache
+        for value in range(4):
+            self.cursor.execute('SELECT %s::int4 + 1', [value])
+            self.assertEqual(self.cursor.fetchone(), (value + 1,))
+        self.assertEqual(cache.hits, 2)
+        self.assertEqual(len(cache), 1)
+
+    def test_evict(self):
+        for query in ('SELECT 1', 'SELECT 2', 'SELECT 3'):
+            self.cursor.execute(query)
+            self.cursor.execute(query)
+        self.assertEqual(len(self.connection.statement_cache), 2)
+        self.assertEqual(len(self.prepared()), 2)
+
+    def test_evict_failed(self):
+        # Failing to deallocate an evicted statement leaves the transaction
+        # usable
+        self.connection.statement_cache.maxsize = 1
+        self.cursor.execute('CREATE TEMPORARY TABLE prepared_evict (a int4)')
+        for _ in range(2):
+            self.cursor.execute('SELECT 1')
+        self.connection.conn.execute('DEALLOCATE ALL').check_cmd_result()
+        try:
+            self.connection._autocommit = False
+            self.cursor.execute('INSERT INTO prepared_evict VALUES (1)')
+            self.cursor.execute('SELECT 2')
+            with self.assertLogs('egress.connection', 'WARNING'):
+                self.cursor.execute('SELECT 2')
+            self.assertEqual(self.cursor.fetchall(), [(2,)])
+            self.connection.commit()
+        finally:
+            self.connection.rollback()
+            self.connection._autocommit = True
+        self.cursor.execute('SELECT a FROM prepared_evict')
+        self.assertEqual(self.cursor.fetchall(), [(1,)])
+
+    def test_deallocate(self):
+        for _ in range(2):
+            self.cursor.execute('SELECT %s::int4', [1])
+        self.assertEqual(len(self.connection.statement_cache), 1)
+        self.cursor.execute('DEALLOCATE ALL')
+        self.assertEqual(len(self.connection.statement_cache), 0)
+        self.cursor.execute('SELECT %s::int4', [1])
+        self.assertEqual(self.cursor.fetchall(), [(1,)])
+
+    def test_user_statements(self):
+        # Statements prepared by the user are left alone
+        self.cursor.execute('PREPARE mine AS SELECT 1')
+        self.cursor.execute('PREPARE other AS SELECT 2')
+        for _ in range(2):
+            self.cursor.execute('SELECT %s::int4', [1])
+        self.cursor.execute('DEALLOCATE other')
+        self.assertEqual(len(self.connection.statement_cache), 0)
+        self.assertEqual(self.prepared(), ['mine'])
+        for _ in range(2):
+            self.cursor.execute('SELECT %s::int4', [1])
+        self.cursor.execute('CREATE TEMPORARY TABLE prepared_user (a int4)')
+        self.assertEqual(self.prepared(), ['mine'])
+
+    def test_missing_statement(self):
+        # Deallocated where the cache does not see it
+        for _ in range(2):
+            self.cursor.execute('SELECT %s::int4', [1])
+        self.connection.conn.execute('DEALLOCATE ALL').check_cmd_result()
+        self.cursor.execute('SELECT %s::int4', [2])
+        self.assertEqual(self.cursor.fetchall(), [(2,)])
+        self.assertEqual(len(self.connection.statement_cache), 0)
+
+    def test_schema_change(self):
+        query = 'SELECT * FROM prepared_ddl WHERE a = %s'
+        self.cursor.execute('CREATE TEMPORARY TABLE prepared_ddl (a int4)')
+        self.cursor.execute('INSERT INTO prepared_ddl VALUES (1)')
+        for _ in range(2):
+            self.cursor.execute(query, [1])
+        self.assertEqual(len(self.connection.statement_cache), 1)
+        self.cursor.execute('ALTER TABLE prepared_ddl ADD COLUMN b int4')
+        self.assertEqual(len(self.connection.statement_cache), 0)
+        self.assertEqual(self.prepared(), [])
+        self.cursor.execute(query, [1])
+        self.assertEqual(self.cursor.fetchall(), [(1, None)])
+
+    def test_schema_change_executemany(self):
+        query = 'SELECT * FROM prepared_ddl'
+        self.cursor.execute('CREATE TEMPORARY TABLE prepared_ddl (a int4)')
+        for _ in range(2):
+            self.cursor.execute(query)
+        self.assertEqual(len(self.connection.statement_cache), 1)
+        self.cursor.executemany('ALTER TABLE prepared_ddl ADD COLUMN b int4', [()])
+        self.assertEqual(len(self.connection.statement_cache), 0)
+        self.cursor.execute(query)
+        self.assertEqual(len(self.cursor.description), 2)
+
+    def test_stale_plan(self):
+        # A change the cache does not see, as it is made by another connection
+        query = 'SELECT * FROM prepared_stale WHERE a = %s'
+        self.cursor.execute('CREATE TABLE prepared_stale (a int4)')
+        try:
+            for _ in range(2):
+                self.cursor.execute(query, [1])
+            other = connect()
+            other.cursor().execute('ALTER TABLE prepared_stale ADD COLUMN b int4')
+            other.close()
+            self.cursor.execute(query, [1])
+            self.assertEqual(len(self.cursor.description), 2)
+
+            self.connection._autocommit = False
+            for _ in range(2):
+                self.cursor.execute(query, [1])
+            self.connection.commit()
+            other = connect()
+            other.cursor().execute('ALTER TABLE prepared_stale ADD COLUMN c int4')
+            other.close()
+            self.cursor.execute(query, [1])
+            self.assertEqual(len(self.cursor.description), 3)
+            self.connection.rollback()
+        finally:
+            self.connection._autocommit = True
+            self.cursor.execute('DROP TABLE prepared_stale')
+
+    def test_stale_plan_in_transaction(self):
+        query = 'SELECT * FROM prepared_aborted WHERE a = %s'
+        self.cursor.execute('CREATE TABLE prepared_aborted (a int4)')
+        try:
+            self.connection._autocommit = False
+            for _ in range(2):
+                self.cursor.execute(query, [1])
+            self.connection.commit()
+            name, = self.connection.statement_cache._data.values()
+            self.cursor.execute('SELECT 1')
+            other = connect()
+            other.cursor().execute('ALTER TABLE prepared_aborted ADD COLUMN b int4')
+            other.close()
+            # The transaction was not started by this execute, so is aborted
+            with self.assertRaises(db.NotSupportedError):
+                self.cursor.execute(query, [1])
+            self.assertEqual(len(self.connection.statement_cache), 0)
+            self.connection.rollback()
+            self.assertNotIn(name, self.prepared())
+        finally:
+            self.connection.rollback()
+            self.connection._autocommit = True
+            self.cursor.execute('DROP TABLE prepared_aborted')
+
+
+class TestQuery(unittest.TestCase):
+
+    def test_query(self):
+        connection = connect()
+        with connection.cursor() as cursor:
+            self.assertIsNone(cursor.query)
+            cursor.execute('SELECT %s::int4, %s::text', [1, 'a'])
+            self.assertEqual(cursor.query, 'SELECT 1::int4, a::text')
+        connection.close()
+
+
+class TestInputSizes(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = connect()
+        self.cursor = self.connection.cursor()
+
+    def tearDown(self):
+        self.cursor.close()
+        self.connection.close()
+
+    def test_declared(self):
+        self.cursor.setinputsizes([types.DoubleType, db.STRING, None])
+        self.cursor.execute(
+            'SELECT pg_typeof(%s)::text, %s::text, %s::int4', [1, 2, 3],
+        )
+        self.assertEqual(self.cursor.fetchall(), [('double precision', '2', 3)])
+
+    def test_mismatch(self):
+        self.cursor.setinputsizes([types.DateType, types.DateType])
+        self.cursor.execute('SELECT %s::text, %s::int4', ['abc', None])
+        self.assertEqual(self.cursor.fetchall(), [('abc', None)])
+
+    def test_next_operation(self):
+        self.cursor.setinputsizes([types.JsonbType])
+        self.cursor.execute('SELECT %s::text', ['hello'])
+        self.assertEqual(self.cursor.fetchall(), [('"hello"',)])
+        self.cursor.execute('SELECT %s::text', ['hello'])
+        self.assertEqual(self.cursor.fetchall(), [('hello',)])
+
+        self.cursor.setinputsizes([types.DoubleType])
+        self.cursor.executemany('SELECT pg_typeof(%s)::text', [[1], [2]])
+        self.assertEqual(self.cursor.fetchall(), [('double precision',)])
+        self.cursor.execute('SELECT pg_typeof(%s)::text', [1])
+        self.assertEqual(self.cursor.fetchall(), [('smallint',)])
+
+    def test_buffers_reused(self):
+        self.cursor.execute('SELECT %s::int4', [1])
+        buffers = self.cursor._param_buffers[1]
+        self.cursor.execute('SELECT %s::text', ['a'])
+        self.assertIs(self.cursor._param_buffers[1], buffers)
+        self.assertEqual(self.cursor.fetchall(), [('a',)])
+
+
+class TestImplicitBegin(unittest.TestCase):
+    '''
+    Outside autocommit, the first statement opens a transaction.
+    '''
+
+    def setUp(self):
+        self.connection = db.connect(**DATABASE)
+        self.cursor = self.connection.cursor()
+
+    def tearDown(self):
+        self.cursor.close()
+        self.connection.close()
+
+    def test_begin(self):
+        self.cursor.execute('SELECT %s::int4', [1])
+        self.assertEqual(self.cursor.fetchall(), [(1,)])
+        self.assertTrue(self.connection._in_txn)
+        self.connection.rollback()
+        self.assertFalse(self.connection._in_txn)
+
+    def test_error(self):
+        with self.assertRaises(db.ProgrammingError):
+            self.cursor.execute('SELECT * FROM no_such_table')
+        self.assertEqual(self.connection.conn.transaction_status(), 3)
+        self.connection.rollback()
+        self.cursor.execute('SELECT 2')
+        self.assertEqual(self.cursor.fetchall(), [(2,)])
+
+    def test_prepared(self):
+        self.connection.prepare_threshold = 1
+        self.cursor.execute('SELECT 3')
+        self.assertEqual(self.cursor.fetchall(), [(3,)])
+        self.assertTrue(self.connection._in_txn)
+
+
+class TestNextSet(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = connect()
+        self.cursor = self.connection.cursor()
+
+    def tearDown(self):
+        self.cursor.close()
+        self.connection.close()
+
+    def test_nextset(self):
+        self.cursor.execute(
+            "SELECT 1::int4 AS a; SELECT ';' AS b, 2::int8 AS c -- ;\n; SELECT 3::int2",
+        )
+        self.assertEqual([d.name for d in self.cursor.description], ['a'])
+        self.assertEqual(self.cursor.fetchall(), [(1,)])
+        self.assertTrue(self.cursor.nextset())
+        self.assertEqual([d.name for d in self.cursor.description], ['b', 'c'])
+        self.assertEqual(self.cursor.fetchone(), (';', 2))
+        self.assertTrue(self.cursor.nextset())
+        self.assertEqual(self.cursor.fetchall(), [(3,)])
+        self.assertIsNone(self.cursor.nextset())
+
+    def test_query(self):
+        self.cursor.execute('SELECT 1')
+        self.cursor.execute('SELECT 1; SELECT 2')
+        self.assertEqual(self.cursor.query, 'SELECT 1; SELECT 2')
+
+    def test_function_body(self):
+        self.assertEqual(split_statements(
+            "CREATE OR REPLACE FUNCTION pg_temp.f() RETURNS int LANGUAGE sql"
+            " BEGIN ATOMIC SELECT CASE WHEN true THEN 1 END; SELECT 2; END;"
+            " SELECT pg_temp.f()"
+        ), (
+            "CREATE OR REPLACE FUNCTION pg_temp.f() RETURNS int LANGUAGE sql"
+            " BEGIN ATOMIC SELECT CASE WHEN true THEN 1 END; SELECT 2; END",
+            "SELECT pg_temp.f()",
+        ))
+        self.assertEqual(split_statements('BEGIN; SELECT 1; END'), ('BEGIN', 'SELECT 1', 'END'))
+
+        self.cursor.execute(
+            'CREATE FUNCTION pg_temp.f() RETURNS int LANGUAGE sql BEGIN ATOMIC SELECT 1; SELECT 2; END'
+        )
+        self.cursor.execute('SELECT pg_temp.f()')
+        self.assertEqual(self.cursor.fetchall(), [(2,)])
+
+    def test_parentheses(self):
+        rule = (
+            'CREATE RULE nextset_rule AS ON INSERT TO nextset_test'
+            ' DO ALSO (INSERT INTO nextset_log VALUES (1); INSERT INTO nextset_log VALUES (2))'
+        )
+        self.assertEqual(split_statements(rule + '; SELECT 1'), (rule, 'SELECT 1'))
+        # An unbalanced closing parenthesis does not stop later splits
+        self.assertEqual(split_statements('SELECT 1); SELECT 2'), ('SELECT 1)', 'SELECT 2'))
+
+        self.cursor.execute(
+            'CREATE TEMPORARY TABLE nextset_test (a int4);'
+            ' CREATE TEMPORARY TABLE nextset_log (a int4);'
+            + rule + '; INSERT INTO nextset_test VALUES (0)'
+        )
+        self.cursor.execute('SELECT count(*) FROM nextset_log')
+        self.assertEqual(self.cursor.fetchall(), [(2,)])
+
+    def test_nested_comment(self):
+        self.assertEqual(
+            split_statements('SELECT /* a /* b; */ c; */ 1; SELECT 2 /* d'),
+            ('SELECT /* a /* b; */ c; */ 1', 'SELECT 2 /* d'),
+        )
+        self.cursor.execute('SELECT /* a /* b; */ c; */ 1; SELECT 2')
+        self.assertEqual(self.cursor.fetchall(), [(1,)])
+        self.assertTrue(self.cursor.nextset())
+        self.assertEqual(self.cursor.fetchall(), [(2,)])
+
+    def test_error(self):
+        self.cursor.execute('CREATE TEMPORARY TABLE nextset_test (a int4)')
+        with self.assertRaises(db.DataError):
+            self.cursor.execute(
+                'INSERT INTO nextset_test VALUES (1); SELECT 1 / 0',
+            )
+        self.cursor.execute('SELECT count(*) FROM nextset_test')
+        self.assertEqual(self.cursor.fetchall(), [(0,)])
+        self.assertIsNone(self.cursor.nextset())
+
+    def test_error_without_pipeline(self):
+        # The statements are still run in one transaction
+        with mock.patch.object(libpq, 'HAS_PIPELINE', False):
+            self.test_error()
+
+
+class TestExecuteMany(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = connect()
+        self.cursor = self.connection.cursor()
+        self.cursor.execute('CREATE TEMPORARY TABLE many (a int PRIMARY KEY, b text)')
+
+    def tearDown(self):
+        self.connection.close()
+
+    def count(self):
+        self.cursor.execute('SELECT count(*) FROM many')
+        return self.cursor.fetchone()[0]
+
+    def test_insert(self):
+        self.cursor.executemany_batch_size = 7
+        self.cursor.executemany(
+            'INSERT INTO many VALUES (%s, %s)',
+            [(i, str(i)) for i in range(50)],
+        )
+        self.assertEqual(self.cursor.rowcount, 50)
+        self.assertEqual(self.count(), 50)
+
+    def test_returning(self):
+        # Enough results to fill the socket buffers before the batch is sent
+        value = 'x' * 10000
+        self.cursor.executemany(
+            'INSERT INTO many VALUES (%s, %s) RETURNING b',
+            [(i, value) for i in range(1000)],
+        )
+        self.assertEqual(self.cursor.fetchall(), [(value,)])
+        self.assertEqual(self.count(), 1000)
+
+    def test_error_index(self):
+        with self.assertRaises(db.IntegrityError) as ctx:
+            self.cursor.executemany(
+                'INSERT INTO many VALUES (%s, %s)',
+                [(1, 'a'), (2, 'b'), (1, 'c'), (3, 'd')],
+            )
+        self.assertEqual(ctx.exception.index, 2)
+        # In autocommit mode the batch is all or nothing
+        self.assertEqual(self.count(), 0)
+
+
+class TestCopy(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = connect()
+        self.cursor = self.connection.cursor()
+        self.cursor.execute('''
+            CREATE TEMPORARY TABLE copied (
+                a int, b bigint, c text, d timestamp, e date, f bytea
+            )
+        ''')
+
+    def tearDown(self):
+        self.connection.close()
+
+    def test_copy_records(self):
+        when = datetime.datetime(2020, 5, 6, 7, 8, 9, 123456)
+        records = [
+            (i, i * 10, 'x%d' % i, when, when.date(), b'\x00' * i)
+            for i in range(100)
+        ]
+        records.append((None,) * 6)
+        self.cursor.copy_buffer_size = 256
+        self.cursor.copy_records('copied', None, iter(records))
+        self.assertEqual(self.cursor.rowcount, 101)
+        self.cursor.execute('SELECT * FROM copied')
+        self.assertEqual(self.cursor.fetchall(), records)
+
+    def test_copy_columns(self):
+        self.cursor.copy_records('copied', ['c', 'a'], [('x', 1)])
+        self.cursor.execute('SELECT a, b, c FROM copied')
+        self.assertEqual(self.cursor.fetchall(), [(1, None, 'x')])
+
+    def test_copy_column_types(self):
+        self.cursor.execute('CREATE TEMPORARY TABLE copied_types (a int4[], b int8[], c numeric, d text[])')
+        records = [([1, None], [[1], [2]], 1, []), ([2 ** 20], [2 ** 40], 2.5, ['x'])]
+        self.cursor.copy_records('copied_types', None, records)
+        self.cursor.execute('SELECT * FROM copied_types')
+        self.assertEqual(self.cursor.fetchall(), [
+            ([1, None], [[1], [2]], Decimal(1), []),
+            ([2 ** 20], [2 ** 40], Decimal('2.5'), ['x']),
+        ])
+
+    def test_copy_bad_value(self):
+        with self.assertRaises(db.DataError):
+            self.cursor.copy_records('copied', ['b'], [(1,), ('bad',)])
+        self.connection.rollback()
+        self.cursor.execute('SELECT count(*) FROM copied')
+        self.assertEqual(self.cursor.fetchone(), (0,))
+
+    def test_copy_out(self):
+        query = "SELECT i, 'x' || i, NULLIF(i %% 2, 0) FROM generate_series(1, 50) i"
+        self.cursor.execute(query)
+        expected = self.cursor.fetchall()
+        rows = self.cursor.copy_out(query.replace('%%', '%'))
+        self.assertEqual(self.cursor.description[1].type_code, 25)
+        self.assertEqual(list(rows), expected)
+        self.assertEqual(self.cursor.rowcount, 50)
+
+    def test_copy_out_batches(self):
+        self.cursor.copy_batch_size = 7
+        rows = self.cursor.copy_out('SELECT i FROM generate_series(1, 50) i')
+        self.assertEqual(list(rows), [(i,) for i in range(1, 51)])
+        self.assertEqual(self.cursor.rowcount, 50)
+
+    def test_copy_out_file(self):
+        out = io.BytesIO()
+        self.cursor.copy_out('SELECT 1', out)
+        self.assertTrue(out.getvalue().startswith(b'PGCOPY\n\xff\r\n\x00'))
+        self.assertEqual(self.cursor.rowcount, 1)
+
+    def test_copy_out_abandoned(self):
+        rows = self.cursor.copy_out('SELECT i FROM generate_series(1, 1000) i')
+        self.assertEqual(next(rows), (1,))
+        self.cursor.execute('SELECT 2')
+        self.assertEqual(self.cursor.fetchall(), [(2,)])
+        self.assertEqual(list(rows), [])
+
+    def test_copy_out_reused(self):
+        # Nothing is read until the first row is asked for
+        rows = self.cursor.copy_out("SELECT i, 'x' FROM generate_series(1, 3) i")
+        self.cursor.execute('SELECT 2')
+        self.assertEqual(list(rows), [])
+        first = self.cursor.copy_out("SELECT 'x', i FROM generate_series(1, 3) i")
+        second = self.cursor.copy_out('SELECT i FROM generate_series(1, 3) i;\n ')
+        self.assertEqual(list(first), [])
+        self.assertEqual(list(second), [(1,), (2,), (3,)])
+
+    def test_copy_out_cached(self):
+        cache = self.connection.description_cache
+        list(self.cursor.copy_out('SELECT 1'))
+        misses = cache.misses
+        self.assertEqual(list(self.cursor.copy_out('SELECT 1;')), [(1,)])
+        self.assertEqual(cache.misses, misses)
+        self.assertEqual(self.cursor.description[0].type_code, 23)
@@ -4,7 +4,10 @@ Tests for postgres numeric types
 
 import unittest
 
+from decimal import Decimal
+
 import egress as db
+from egress.types import NumericType
 from egress.tests.config import DATABASE
 from egress.tests.utils import create_db, drop_db
 
@@ -65,3 +68,42 @@ class TestNumericTypes(unittest.TestCase):
         """
         result = self.execute_operation_on_db(insert_numeric)
         self.assertEqual(result, 1)
+
+
+class TestNumericCodec(unittest.TestCase):
+    '''
+    Numeric values must survive the round trip through postgres exactly,
+    including their scale.
+    '''
+    values = [
+        '0', '0.00', '1', '-1', '12345', '1000.02', '0.0001', '0.00001',
+        '-123.456', '100000000', '0.10', '99999999.99999999',
+        '12345678901234567890.123456789', '-0.000000000000086619',
+    ]
+
+    def test_codec(self):
+        for value in self.values:
+            value = Decimal(value)
+            oid, data, size = NumericType.format(value)
+            parsed = NumericType.parse(data, size, None)
+            self.assertEqual(parsed.as_tuple(), value.as_tuple())
+
+    def test_special(self):
+        for value in ('Infinity', '-Infinity'):
+            oid, data, size = NumericType.format(Decimal(value))
+            self.assertEqual(NumericType.parse(data, size, None), Decimal(value))
+        oid, data, size = NumericType.format(Decimal('NaN'))
+        self.assertTrue(NumericType.parse(data, size, None).is_nan())
+
+    def test_server(self):
+        connection = connect(dbname=db_name)
+        connection._autocommit = True
+        with connection.cursor() as cursor:
+            for value in self.values + ['Infinity', '-Infinity']:
+                cursor.execute('SELECT %s::numeric::text, %s::text::numeric', [
+                    Decimal(value), value,
+                ])
+                text, parsed = cursor.fetchone()
+                self.assertEqual(Decimal(text).as_tuple(), Decimal(value).as_tuple())
+                self.assertEqual(parsed.as_tuple(), Decimal(value).as_tuple())
+        connection.close()
@@ -0,0 +1,160 @@
+'''
+Tests for the type codecs
+'''
+
+import copy
+import datetime
+import json
+import pickle
+import unittest
+
+from decimal import Decimal
+
+from array import array
+
+from egress import types
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class TestMany(unittest.TestCase):
+    '''
+    The batch codecs must agree with the single value ones.
+    '''
+
+    def test_fixed_width(self):
+        values = [0, 1, -1, 2 ** 31 - 1]
+        data = types.IntType.format_many(values)
+        self.assertEqual(data, [types.IntType.encode(value) for value in values])
+        self.assertEqual(types.IntType.parse_many(data), values)
+
+    def test_column(self):
+        values = [datetime.date(2000, 1, 1), None, datetime.date(1999, 12, 31)]
+        data = types.DateType.format_column(values)
+        self.assertIsNone(data[1])
+        self.assertEqual(types.DateType.parse_column(data, None), values)
+
+    def test_varlen(self):
+        values = ['a', '', 'ünï']
+        data = types.StringType.format_many(values)
+        self.assertEqual(types.StringType.parse_many(data), values)
+
+
+class TestArray(unittest.TestCase):
+
+    def roundtrip(self, value):
+        oid, data, size = types.ArrayType.format(value)
+        return oid, types.ArrayType.parse(data, size, None)
+
+    def test_dimensions(self):
+        self.assertEqual(self.roundtrip([1, None, 3]), (1005, [1, None, 3]))
+        self.assertEqual(self.roundtrip([[1, 2], [3, 2 ** 40]]), (1016, [[1, 2], [3, 2 ** 40]]))
+        self.assertEqual(self.roundtrip((['a', ''], ['', None])), (1009, [['a', ''], ['', None]]))
+
+    def test_ragged(self):
+        with self.assertRaises(ValueError):
+            types.ArrayType.format([[1, 2], [3]])
+
+    def test_text(self):
+        self.assertEqual(types.format_type([]), (0, b'{}', 0, 0))
+        self.assertEqual(types.format_type([None, 'a"b', 1]), (0, b'{NULL,"a\\"b","1"}', 0, 0))
+
+    def test_fixed(self):
+        values = [[datetime.datetime(2000, 1, 1)], [datetime.datetime(2020, 2, 29, 1, 2, 3)]]
+        self.assertEqual(self.roundtrip(values), (1185, values))
+
+
+class TestRange(unittest.TestCase):
+
+    def roundtrip(self, value):
+        oid, data, size = types.RangeType.format(value)
+        return oid, types.BaseType._oid[oid].parse(data, size, None)
+
+    def test_bounds(self):
+        value = types.Range(1, 10)
+        self.assertEqual(self.roundtrip(value), (3904, value))
+        value = types.Range(None, 2 ** 40, '(]')
+        self.assertEqual(self.roundtrip(value), (3926, value))
+        value = types.Range(Decimal('1.5'), None, '()')
+        self.assertEqual(self.roundtrip(value), (3906, value))
+        value = types.Range(datetime.date(2020, 1, 1), datetime.date(2020, 2, 1), '[]')
+        self.assertEqual(self.roundtrip(value), (3912, value))
+
+    def test_text(self):
+        self.assertEqual(types.format_type(types.Range(empty=True)), (0, b'empty', 0, 0))
+        self.assertEqual(types.format_type(types.Range('a', None, '(]')), (0, b'("a",)', 0, 0))
+
+    def test_array(self):
+        values = [types.Range(1, 2), types.Range(empty=True), types.Range(0, 2 ** 40)]
+        oid, data, size = types.ArrayType.format(values)
+        self.assertEqual(oid, 3927)
+        self.assertEqual(types.ArrayType.parse(data, size, None), values)
+
+
+class TestJson(unittest.TestCase):
+
+    def tearDown(self):
+        types.JsonType.loads = staticmethod(json.loads)
+        types.JsonType.lazy = False
+
+    def test_jsonb(self):
+        value = {'a': [1, None, 'ü']}
+        oid, data, size = types.format_type(value)[:3]
+        self.assertEqual((oid, data[:1]), (3802, b'\x01'))
+        self.assertEqual(types.JsonbType.parse(data, size, None), value)
+
+    def test_loads(self):
+        calls = []
+
+        def loads(data):
+            calls.append(data)
+            return json.loads(data)
+
+        types.JsonType.loads = loads
+        self.assertEqual(types.JsonType.parse(b'[1]', 3, None), [1])
+        self.assertEqual(calls, [b'[1]'])
+
+    def test_lazy(self):
+        types.JsonType.lazy = True
+        value = types.JsonbType.parse(b'\x01{"a": 1}', 9, None)
+        self.assertIsInstance(value, types.JsonProxy)
+        self.assertIsNotNone(value._loads)
+        self.assertEqual(value['a'], 1)
+        self.assertEqual(value, {'a': 1})
+        self.assertEqual(list(value.keys()), ['a'])
+        self.assertEqual(types.format_type(value)[:3], (3802, b'\x01{"a": 1}', 9))
+
+    def test_lazy_copy(self):
+        types.JsonType.lazy = True
+        for parsed in (False, True):
+            value = types.JsonType.parse(b'{"a": [1]}', 10, None)
+            if parsed:
+                value.value
+            for copied in (copy.copy(value), copy.deepcopy(value), pickle.loads(pickle.dumps(value))):
+                self.assertIsInstance(copied, types.JsonProxy)
+                self.assertEqual(copied.raw, b'{"a": [1]}')
+                self.assertEqual(copied, {'a': [1]})
+
+
+class TestArrayContainer(unittest.TestCase):
+
+    def setUp(self):
+        self.data = types.ArrayType.format([[1, 2], [3, 2 ** 40]])[1]
+
+    def tearDown(self):
+        types.ArrayType.container = 'list'
+
+    def test_array(self):
+        types.ArrayType.container = 'array'
+        value = types.ArrayType.parse(self.data, len(self.data), None)
+        self.assertEqual(value, [array('q', [1, 2]), array('q', [3, 2 ** 40])])
+
+    @unittest.skipIf(numpy is None, 'numpy is not installed')
+    def test_numpy(self):
+        types.ArrayType.container = 'numpy'
+        value = types.ArrayType.parse(self.data, len(self.data), None)
+        self.assertEqual(value.shape, (2, 2))
+        self.assertEqual(value.tolist(), [[1, 2], [3, 2 ** 40]])
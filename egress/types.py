@@ -1,17 +1,41 @@
-from ctypes import c_char_p
-
 import datetime
 import json
 import struct
 import uuid
 
+from array import array
+from collections import namedtuple
 from decimal import Decimal
+from functools import lru_cache
 from ipaddress import IPv4Address, IPv6Address, IPv4Network, IPv6Network
-from itertools import repeat
 
 # Positive/Negative infinity values for date types
 DATE_PINF = 0x7FFFFFFF
 DATE_NINF = -0x7FFFFFFF-1
+# and for timestamps, which are 64bit
+TIMESTAMP_PINF = 0x7FFFFFFFFFFFFFFF
+TIMESTAMP_NINF = -0x7FFFFFFFFFFFFFFF-1
+
+# Dates are sent as days, and timestamps as microseconds, since 2000-01-01
+DATE_EPOCH_ORDINAL = datetime.date(2000, 1, 1).toordinal()
+DATETIME_EPOCH = datetime.datetime(2000, 1, 1)
+UTC_EPOCH = datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc)
+
+# array.array typecodes for struct formats of the same size
+ARRAY_TYPECODES = {
+    code: code
+    for code in 'hiqfd'
+    if array(code).itemsize == struct.calcsize(code)
+}
+
+
+@lru_cache(maxsize=32)
+def datetime_epoch(tzinfo):
+    '''
+    Return 2000-01-01 in tzinfo's local time.
+    '''
+    return DATETIME_EPOCH.replace(tzinfo=tzinfo)
+
 
 def infer_parser(ftype, fmod=-1):
     '''
@@ -24,14 +48,97 @@ def format_type(value):
     try:
         return BaseType._type[type(value)].format(value) + (1,)
     except KeyError:
-        value = str(value).encode('utf-8')
-        return (0, value, 0, 0)
+        return format_text(value)
+
+
+def format_text(value):
+    '''
+    Pass a value as text of unknown type, leaving postgres to infer it.
+    '''
+    if value is None:
+        return (0, None, 0, 0)
+    if isinstance(value, (list, tuple)):
+        value = array_literal(value)
+    return (0, str(value).encode('utf-8'), 0, 0)
+
+
+def array_literal(value):
+    '''
+    Return the text input form of a list, which may be nested.
+    '''
+    if 0 in ArrayType.dimensions(value):
+        return '{}'
+    items = []
+    for item in value:
+        if item is None:
+            items.append('NULL')
+        elif isinstance(item, (list, tuple)):
+            items.append(array_literal(item))
+        else:
+            items.append(quote_element(item))
+    return '{%s}' % ','.join(items)
+
+
+def quote_element(value):
+    '''
+    Quote the text of an array element or range bound.
+    '''
+    return '"%s"' % str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+
+def get_formatter(kind):
+    '''
+    Return a function to format parameters declared as the given Type.
+
+    Values the Type can not format, including None, fall back to
+    format_type.
+    '''
+    if isinstance(kind, BaseType):
+        kind = type(kind)
+    if not isinstance(kind, BaseTypeMeta):
+        return format_type
+    if issubclass(kind, StringType):
+        return format_text
+    fmt = kind.format
+
+    def formatter(value):
+        if value is None:
+            return format_type(value)
+        try:
+            return fmt(value) + (1,)
+        except (AttributeError, KeyError, TypeError, ValueError, struct.error):
+            return format_type(value)
+
+    return formatter
+
+
+class TypeLookupNeeded(Exception):
+    '''
+    Raised while decoding a value which holds another of a type the
+    TypeRegistry has not looked up yet.
+    '''
+    def __init__(self, oid):
+        super().__init__(oid)
+        self.oid = oid
+
+
+def restore_nulls(values, parsed):
+    '''
+    Given a column of raw values with None for NULLs, and the parsed values of
+    those which are not None, return the whole parsed column.
+    '''
+    if len(parsed) == len(values):
+        return parsed
+    parsed = iter(parsed)
+    return [None if value is None else next(parsed) for value in values]
 
 
 class BaseTypeMeta(type):
     def __new__(cls, name, bases, namespace, **kwds):
-        if 'fmt' in namespace and 'size' not in namespace:
-            namespace['size'] = struct.calcsize(namespace['fmt'])
+        if 'fmt' in namespace:
+            namespace['_struct'] = struct.Struct(namespace['fmt'])
+            if 'size' not in namespace:
+                namespace['size'] = namespace['_struct'].size
         new_cls = super().__new__(cls, name, bases, namespace, **kwds)
         if new_cls.oid is not None:
             new_cls._oid[new_cls.oid] = new_cls
@@ -47,46 +154,290 @@ class BaseType(metaclass=BaseTypeMeta):
     oid = None
     klass = None
     fmt = ''
+    # The oid of the array type with this as its elements
+    array_oid = None
+    # For types whose values are a single struct field, a classmethod taking
+    # a list of unpacked fields and returning their values
+    convert_many = None
 
     @classmethod
     def parse(cls, value, size, tzinfo):
-        return struct.unpack(cls.fmt, value[:size])[0]
+        return cls._struct.unpack(value[:size])[0]
 
     @classmethod
     def format(cls, value):
-        return (cls.oid, struct.pack(cls.fmt, value), cls.size)
+        return (cls.oid, cls._struct.pack(value), cls.size)
+
+    @classmethod
+    def encode(cls, value):
+        '''
+        Return the binary representation of value as this type, as used by
+        COPY.
+        '''
+        return cls.format(value)[1]
+
+    @classmethod
+    def parse_many(cls, buffers, tzinfo=None):
+        '''
+        Parse a sequence of raw values, none of which are NULL.
+        '''
+        parse = cls.parse
+        return [parse(value, len(value), tzinfo) for value in buffers]
+
+    @classmethod
+    def format_many(cls, values):
+        '''
+        Encode a sequence of values, none of which are None, as encode does.
+        '''
+        encode = cls.encode
+        return [encode(value) for value in values]
+
+    @classmethod
+    def parse_column(cls, values, tzinfo):
+        '''
+        Parse a whole column of raw values, as returned by Result.get_column.
+        '''
+        present = [value for value in values if value is not None]
+        return restore_nulls(values, cls.parse_many(present, tzinfo))
+
+    @classmethod
+    def format_column(cls, values):
+        '''
+        Encode a whole column of values, leaving None in place of NULLs.
+        '''
+        present = [value for value in values if value is not None]
+        return restore_nulls(values, cls.format_many(present))
+
+    @classmethod
+    def unpack_many(cls, buffers):
+        '''
+        Unpack a sequence of fixed width values with a single struct call.
+        '''
+        fmt = '!%d%s' % (len(buffers), cls.fmt.lstrip('!'))
+        return list(struct.unpack(fmt, b''.join(buffers)))
+
+
+class FixedWidthType(BaseType):
+    '''
+    A type whose values are a single struct field, so whole columns can be
+    unpacked at once.
+    '''
+
+    @classmethod
+    def encode(cls, value):
+        # Unlike format, which may choose a smaller type for parameters, this
+        # must match the column type exactly.
+        return cls._struct.pack(value)
+
+    @classmethod
+    def parse_many(cls, buffers, tzinfo=None):
+        return cls.unpack_many(buffers)
+
+    @classmethod
+    def convert_many(cls, values, tzinfo=None):
+        return values
+
+    @classmethod
+    def format_many(cls, values):
+        pack = cls._struct.pack
+        return [pack(value) for value in values]
+
+
+@lru_cache(maxsize=None)
+def fixed_array_struct(fmt):
+    '''
+    A struct to unpack an element of an array without NULLs, skipping the
+    length before it.
+    '''
+    return struct.Struct('!4x' + fmt)
 
 
 class ArrayType(BaseType):
+    '''
+    Arrays of any number of dimensions, as nested lists.
 
-    @staticmethod
-    def parse(value, size, tzinfo):
-        ndim, flags, element_type = struct.unpack('!iii', value[:12])
-
-        dim_info = []
-        offs = 12
-        for dim in range(ndim):
-            dim_info.append(
-                struct.unpack('!ii', value[offs:offs+8])
-            )
-            offs += 8
+    The lower bounds of the dimensions are ignored.
 
-        assert ndim == 1, 'Only single dimension arrays handled currently!'
-        cast = infer_parser(element_type)
+    Arrays of fixed width numbers without NULLs are decoded in a single pass.
+    Setting container to 'array' returns those as array.array (as lists of
+    them if there are several dimensions), or to 'numpy' as a numpy array
+    of the same shape.
+    '''
+    header = struct.Struct('!iii')
 
-        dim, lb = dim_info[0]
-        ub = lb + dim - 1
-        val = [None] * dim
+    container = 'list'
+    # The type of the elements, if their OID is not a built in type
+    element = None
+    # The OID of the elements of columns of this type, which encode must send
+    # them as
+    element_oid = None
 
-        for x in range(lb, ub+1):
-            el_size = struct.unpack('!i', value[offs:offs+4])[0]
+    @classmethod
+    def parse(cls, value, size, tzinfo):
+        value = value[:size]
+        ndim, flags, element_type = cls.header.unpack_from(value)
+        if not ndim:
+            return []
+        # Pairs of (size, lower bound) for each dimension
+        dims = struct.unpack_from('!%di' % (2 * ndim), value, 12)[::2]
+
+        offs = 12 + 8 * ndim
+        count = 1
+        for dim in dims:
+            count *= dim
+
+        kind = cls.element or infer_parser(element_type)
+        if not flags and kind.convert_many is not None and len(value) == offs + count * (4 + kind.size):
+            return cls.parse_fixed(value, offs, dims, count, kind, tzinfo)
+
+        unpack_from = struct.unpack_from
+        elements = []
+        for _ in range(count):
+            el_size = unpack_from('!i', value, offs)[0]
             offs += 4
-            if el_size in (-1, 0):
-                val.append(None)
+            if el_size == -1:
+                elements.append(None)
                 continue
-            val[x-1] = cast.parse(value[offs:offs+el_size], el_size, tzinfo)
+            elements.append(value[offs:offs+el_size])
             offs += el_size
-        return val
+
+        return cls.reshape(kind.parse_column(elements, tzinfo), dims)
+
+    @classmethod
+    def parse_fixed(cls, value, offs, dims, count, kind, tzinfo):
+        '''
+        Decode the elements of an array of a single field type, which has no
+        NULLs, with one struct iteration.
+        '''
+        fmt = kind.fmt.lstrip('!')
+        if issubclass(kind, FixedWidthType) and cls.container == 'numpy':
+            import numpy
+            dtype = numpy.dtype([('size', '>i4'), ('value', '>' + fmt)])
+            elements = numpy.frombuffer(value, dtype, count, offs)['value']
+            return elements.astype(elements.dtype.newbyteorder('=')).reshape(dims)
+        unpacked = fixed_array_struct(fmt).iter_unpack(memoryview(value)[offs:])
+        elements = [element for element, in unpacked]
+        if issubclass(kind, FixedWidthType):
+            if cls.container == 'array' and fmt in ARRAY_TYPECODES:
+                return cls.reshape(array(ARRAY_TYPECODES[fmt], elements), dims)
+        return cls.reshape(kind.convert_many(elements, tzinfo), dims)
+
+    @staticmethod
+    def reshape(elements, dims):
+        '''
+        Nest a flat sequence of elements into lists of the given dimensions.
+        '''
+        for dim in reversed(dims[1:]):
+            elements = [elements[idx:idx+dim] for idx in range(0, len(elements), dim)]
+        return elements
+
+    @classmethod
+    def format(cls, value):
+        # Raises KeyError if the elements have no common binary type, leaving
+        # format_type to send the array as text.
+        dims = cls.dimensions(value)
+        elements = cls.flatten(value, dims)
+        present = [element for element in elements if element is not None]
+        kind = cls.element_type(present)
+        if kind.array_oid is None:
+            raise KeyError(kind)
+        data = cls.pack(dims, elements, present, kind, kind.oid)
+        return (kind.array_oid, data, len(data))
+
+    @classmethod
+    def encode(cls, value):
+        # The elements must be sent as the column's element type, rather than
+        # the type format would choose for them.
+        if cls.element_oid is None:
+            return cls.format(value)[1]
+        dims = cls.dimensions(value)
+        elements = cls.flatten(value, dims)
+        present = [element for element in elements if element is not None]
+        kind = cls.element or infer_parser(cls.element_oid)
+        return cls.pack(dims, elements, present, kind, cls.element_oid)
+
+    @classmethod
+    def pack(cls, dims, elements, present, kind, element_oid):
+        '''
+        Encode the elements of an array of the given dimensions as kind.
+        '''
+        if 0 in dims:
+            return cls.header.pack(0, 0, element_oid)
+        pack_length = struct.Struct('!i').pack
+        null = pack_length(-1)
+        encoded = restore_nulls(elements, kind.format_many(present))
+        data = [
+            cls.header.pack(len(dims), len(present) != len(elements), element_oid),
+            struct.pack('!%di' % (2 * len(dims)), *[n for dim in dims for n in (dim, 1)]),
+        ]
+        for element in encoded:
+            if element is None:
+                data.append(null)
+            else:
+                data.append(pack_length(len(element)))
+                data.append(element)
+        return b''.join(data)
+
+    @staticmethod
+    def dimensions(value):
+        '''
+        Find the size of each dimension of a nested list, from its first
+        elements.
+        '''
+        dims = []
+        while isinstance(value, (list, tuple)):
+            dims.append(len(value))
+            if not value:
+                break
+            value = value[0]
+        return dims
+
+    @classmethod
+    def flatten(cls, value, dims):
+        '''
+        Return the elements of a nested list in order, checking it has the
+        given dimensions.
+        '''
+        if not isinstance(value, (list, tuple)) or len(value) != dims[0]:
+            raise ValueError('Multidimensional arrays must have sub-arrays with matching dimensions')
+        if len(dims) == 1:
+            for item in value:
+                if isinstance(item, (list, tuple)):
+                    raise ValueError('Multidimensional arrays must have sub-arrays with matching dimensions')
+            return list(value)
+        elements = []
+        for item in value:
+            elements.extend(cls.flatten(item, dims[1:]))
+        return elements
+
+    @staticmethod
+    def element_type(values):
+        '''
+        Choose the type to send the elements of an array as.
+
+        Raises KeyError if they are not all of one type.
+        '''
+        klasses = set(map(type, values))
+        if len(klasses) != 1:
+            raise KeyError(klasses)
+        klass = klasses.pop()
+        if klass is int:
+            # As for LongType.format, but the same size for every element
+            bits = max(value.bit_length() for value in values)
+            if bits < 16:
+                return ShortIntType
+            elif bits < 32:
+                return IntType
+            return LongType
+        if klass is str:
+            return StringType
+        if klass is Range:
+            return RangeType.range_type(values)
+        return BaseType._type[klass]
+
+
+# Lists and tuples are both sent as arrays
+BaseType._type[list] = BaseType._type[tuple] = ArrayType
 
 
 class NoneType(BaseType):
@@ -97,28 +448,50 @@ class NoneType(BaseType):
         return (0, None, 0,)
 
 
-class BoolType(BaseType):
+class BoolType(FixedWidthType):
     fmt = '?'
 
     oid = 16
+    array_oid = 1000
     klass = bool
 
 
 class BinaryType(BaseType):
+    '''
+    bytea, as bytes.
+
+    If zero_copy is set, the cursor returns read only memoryviews of the
+    values in the result instead, which keep it from being freed until they
+    are released. memoryview and bytearray values are sent as bytea too.
+    '''
     oid = 17
+    array_oid = 1001
     klass = bytes
 
+    zero_copy = False
+
     @staticmethod
     def parse(value, size, tzinfo):
         return value[:size]
 
+    @classmethod
+    def parse_many(cls, buffers, tzinfo=None):
+        # The buffers are the values already
+        return list(buffers)
+
     @staticmethod
     def format(value):
-        return (17, c_char_p(value), len(value))
+        if type(value) is not bytes:
+            value = bytes(value)
+        return (17, value, len(value))
+
+
+BaseType._type[memoryview] = BaseType._type[bytearray] = BinaryType
 
 
 class CharType(BaseType):
     oid = 18
+    array_oid = 1002
     fmt = 'c'
 
     @staticmethod
@@ -128,6 +501,7 @@ class CharType(BaseType):
 
 class NameDataType(BaseType):
     oid = 19
+    array_oid = 1003
 
     @staticmethod
     def parse(value, size, tzinfo):
@@ -136,8 +510,9 @@ class NameDataType(BaseType):
         return value[:size].decode('utf-8')
 
 
-class LongType(BaseType):
+class LongType(FixedWidthType):
     oid = 20
+    array_oid = 1016
     fmt = '!q'
     klass = int
 
@@ -152,8 +527,9 @@ class LongType(BaseType):
             return (20, struct.pack('!q', value), 8)
 
 
-class ShortIntType(BaseType):
+class ShortIntType(FixedWidthType):
     oid = 21
+    array_oid = 1005
     fmt = '!h'
 
 
@@ -161,8 +537,9 @@ class Int2VectorType(ArrayType):
     oid = 22
 
 
-class IntType(BaseType):
+class IntType(FixedWidthType):
     oid = 23
+    array_oid = 1007
     fmt = '!i'
 
 
@@ -174,14 +551,20 @@ class StringType(BaseType):
     arguments as "guess this" text.
     '''
     oid = 25
+    array_oid = 1009
 
     @classmethod
     def parse(cls, value, size, tzinfo):
         return value[:size].decode('utf-8')
 
+    @classmethod
+    def encode(cls, value):
+        return value.encode('utf-8')
+
 
-class OidType(BaseType):
+class OidType(FixedWidthType):
     oid = 26
+    array_oid = 1028
     fmt = '!i'  # '!q'
 
 
@@ -220,13 +603,15 @@ class IPv6NetworkType(IPv4AddressType):
     klass = IPv6Network
 
 
-class FloatType(BaseType):
+class FloatType(FixedWidthType):
     oid = 700
+    array_oid = 1021
     fmt = '!f'
 
 
-class DoubleType(BaseType):
+class DoubleType(FixedWidthType):
     oid = 701
+    array_oid = 1022
     klass = float
     fmt = '!d'
 
@@ -243,6 +628,18 @@ class IPAddressType(IPv4AddressType):
     oid = 869
 
 
+class BoolArrayType(ArrayType):
+    oid = 1000
+
+
+class BinaryArrayType(ArrayType):
+    oid = 1001
+
+
+class CharArrayType(ArrayType):
+    oid = 1002
+
+
 class NameArrayType(ArrayType):
     oid = 1003
 
@@ -255,10 +652,30 @@ class Int4ArrayType(ArrayType):
     oid = 1007
 
 
+class Int8ArrayType(ArrayType):
+    oid = 1016
+
+
+class OidArrayType(ArrayType):
+    oid = 1028
+
+
+class FloatArrayType(ArrayType):
+    oid = 1021
+
+
+class DoubleArrayType(ArrayType):
+    oid = 1022
+
+
 class TextArray(ArrayType):
     oid = 1009
 
 
+class BlankPaddedStringArray(ArrayType):
+    oid = 1014
+
+
 class VarcharArray(ArrayType):
     oid = 1015
 
@@ -279,14 +696,30 @@ class TimeArray(ArrayType):
     oid = 1183
 
 
+class TimestampArray(ArrayType):
+    oid = 1115
+
+
 class TimestamptzArray(ArrayType):
     oid = 1185
 
 
+class IntervalArray(ArrayType):
+    oid = 1187
+
+
+class TimeTzArray(ArrayType):
+    oid = 1270
+
+
 class DecimalArray(ArrayType):
     oid = 1231
 
 
+class JsonArray(ArrayType):
+    oid = 199
+
+
 class JsonbArray(ArrayType):
     oid = 3807
 
@@ -299,35 +732,74 @@ class Int8RangeArray(ArrayType):
     oid = 3927
 
 
+class NumRangeArray(ArrayType):
+    oid = 3907
+
+
+class TsRangeArray(ArrayType):
+    oid = 3909
+
+
+class TstzRangeArray(ArrayType):
+    oid = 3911
+
+
+class DateRangeArray(ArrayType):
+    oid = 3913
+
+
 class BlankPaddedString(StringType):
     '''
     char(length), blank-padded string, fixed storage length
     '''
     oid = 1042
+    array_oid = 1014
 
 
 class VarCharType(StringType):
     oid = 1043
+    array_oid = 1015
 
 
 class DateType(BaseType):
+    '''
+    32bit int of days since 2000-01-01.
+
+    infinity and -infinity are read as date.max and date.min. Those are sent
+    as the real dates they are, so infinity can not be written back.
+    '''
     oid = 1082
+    array_oid = 1182
     klass = datetime.date
     fmt = '!i'
 
     @classmethod
     def parse(cls, value, size, tzinfo):
-        val = struct.unpack(cls.fmt, value[:size])[0]
+        return cls.from_days(cls._struct.unpack(value[:size])[0])
+
+    @staticmethod
+    def from_days(val):
         if val == DATE_PINF:
             return datetime.date.max
         if val == DATE_NINF:
             return datetime.date.min
-        return datetime.date(2000, 1, 1) + datetime.timedelta(days=val)
+        return datetime.date.fromordinal(DATE_EPOCH_ORDINAL + val)
+
+    @classmethod
+    def parse_many(cls, buffers, tzinfo=None):
+        return cls.convert_many(cls.unpack_many(buffers), tzinfo)
+
+    @classmethod
+    def convert_many(cls, values, tzinfo=None):
+        if DATE_PINF in values or DATE_NINF in values:
+            return list(map(cls.from_days, values))
+        fromordinal = datetime.date.fromordinal
+        return [fromordinal(DATE_EPOCH_ORDINAL + val) for val in values]
 
     @classmethod
     def format(cls, value):
-        val = (value - datetime.date(2000, 1, 1)).days
-        return (1082, struct.pack(cls.fmt, val), cls.size)
+        val = value.toordinal() - DATE_EPOCH_ORDINAL
+        return (1082, cls._struct.pack(val), cls.size)
 
 
 class TimeOfDayType(BaseType):
@@ -335,12 +807,13 @@ class TimeOfDayType(BaseType):
     64bit int of uSec since midnight.
     '''
     oid = 1083
+    array_oid = 1183
     klass = datetime.time
     fmt = '!q'
 
     @classmethod
     def parse(cls, value, size, tzinfo):
-        time_us = struct.unpack(cls.fmt, value[:size])[0]
+        time_us = cls._struct.unpack(value[:size])[0]
         val, microsecond = divmod(time_us, 1000000)
         val, second = divmod(val, 60)
         hour, minute = divmod(val, 60)
@@ -349,33 +822,72 @@ class TimeOfDayType(BaseType):
     @classmethod
     def format(cls, value):
         val = ((value.hour * 60 + value.minute) * 60 + value.second) * 1000000 + value.microsecond
-        return (cls.oid, struct.pack(cls.fmt, val), cls.size)
+        return (cls.oid, cls._struct.pack(val), cls.size)
 
 
 class TimestampType(BaseType):
+    '''
+    64bit int of uSec since 2000-01-01.
+
+    Values are given the cursor's tzinfo, if any, as a label. infinity and
+    -infinity are read as datetime.max and datetime.min, which are sent as
+    the real timestamps they are.
+    '''
     oid = 1114
+    array_oid = 1115
     fmt = '!q'
 
     @classmethod
     def parse(cls, value, size, tzinfo):
         if size == 0:
             return None
-        val = struct.unpack(cls.fmt, value[:size])[0]
-        if val == DATE_PINF:
-            return datetime.datetime.max
-        if val == DATE_NINF:
-            return datetime.datetime.min
-        return datetime.datetime(2000, 1, 1, tzinfo=tzinfo) + datetime.timedelta(microseconds=val)
+        val = cls._struct.unpack(value[:size])[0]
+        if val == TIMESTAMP_PINF or val == TIMESTAMP_NINF:
+            return cls.infinity(val, tzinfo)
+        return datetime_epoch(tzinfo) + datetime.timedelta(0, 0, val)
+
+    @staticmethod
+    def infinity(val, tzinfo):
+        value = datetime.datetime.max if val == TIMESTAMP_PINF else datetime.datetime.min
+        return value.replace(tzinfo=tzinfo)
+
+    @classmethod
+    def parse_many(cls, buffers, tzinfo=None):
+        return cls.convert_many(cls.unpack_many(buffers), tzinfo)
+
+    @classmethod
+    def convert_many(cls, values, tzinfo=None):
+        epoch = datetime_epoch(tzinfo)
+        timedelta = datetime.timedelta
+        if TIMESTAMP_PINF in values or TIMESTAMP_NINF in values:
+            infinity = cls.infinity
+            return [
+                infinity(val, tzinfo) if val == TIMESTAMP_PINF or val == TIMESTAMP_NINF
+                else epoch + timedelta(0, 0, val)
+                for val in values
+            ]
+        return [epoch + timedelta(0, 0, val) for val in values]
+
+    @staticmethod
+    def to_micros(value, epoch):
+        val = value - epoch
+        return (val.days * 86400 + val.seconds) * 1000000 + val.microseconds
+
+    @classmethod
+    def format(cls, value):
+        val = cls.to_micros(value.replace(tzinfo=None), DATETIME_EPOCH)
+        return (cls.oid, cls._struct.pack(val), cls.size)
 
 
 class IntervalType(BaseType):
     oid = 1186
+    array_oid = 1187
     klass = datetime.timedelta
     fmt = '!qii'
 
     @classmethod
     def parse(cls, value, size, tzinfo):
-        time_us, days, months = struct.unpack(cls.fmt, value[:size])
+        time_us, days, months = cls._struct.unpack(value[:size])
         val = datetime.timedelta(days=days + months * 30, microseconds=time_us)
         return val
 
@@ -383,11 +895,18 @@ class IntervalType(BaseType):
     def format(cls, value):
         months, days = divmod(value.days, 30)
         usec = value.seconds * 1000000 + value.microseconds
-        return (cls.oid, struct.pack(cls.fmt, usec, days, months), cls.size)
+        return (cls.oid, cls._struct.pack(usec, days, months), cls.size)
+
 
+class TimestampTzType(TimestampType):
+    '''
+    64bit int of uSec since 2000-01-01 UTC.
 
-class TimestampTzType(BaseType):
+    Values are converted to the cursor's tzinfo, or left naive in UTC if it
+    is None. Naive values are sent as UTC.
+    '''
     oid = 1184
+    array_oid = 1185
     klass = datetime.datetime
     fmt = '!q'
 
@@ -395,27 +914,43 @@ class TimestampTzType(BaseType):
     def parse(cls, value, size, tzinfo):
         if size == 0:
             return None
-        val = struct.unpack(cls.fmt, value[:size])[0]
-        return datetime.datetime(2000, 1, 1, tzinfo=tzinfo) + datetime.timedelta(microseconds=val)
+        val = cls._struct.unpack(value[:size])[0]
+        if val == TIMESTAMP_PINF or val == TIMESTAMP_NINF:
+            return cls.infinity(val, tzinfo)
+        if tzinfo is None or tzinfo is datetime.timezone.utc:
+            return datetime_epoch(tzinfo) + datetime.timedelta(0, 0, val)
+        return (UTC_EPOCH + datetime.timedelta(0, 0, val)).astimezone(tzinfo)
+
+    @classmethod
+    def convert_many(cls, values, tzinfo=None):
+        if tzinfo is None or tzinfo is datetime.timezone.utc:
+            return super().convert_many(values, tzinfo)
+        timedelta = datetime.timedelta
+        infinity = cls.infinity
+        return [
+            infinity(val, tzinfo) if val == TIMESTAMP_PINF or val == TIMESTAMP_NINF
+            else (UTC_EPOCH + timedelta(0, 0, val)).astimezone(tzinfo)
+            for val in values
+        ]
 
     @classmethod
     def format(cls, value):
-        if value.tzinfo:
-            val = (value - datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc))
+        if value.tzinfo is None:
+            val = cls.to_micros(value, DATETIME_EPOCH)
         else:
-            val = (value - datetime.datetime(2000, 1, 1))
-        val = int(val.total_seconds() * 1000000)
-        return (1184, struct.pack(cls.fmt, val), cls.size)
+            val = cls.to_micros(value, UTC_EPOCH)
+        return (cls.oid, cls._struct.pack(val), cls.size)
 
 
 class TimeTzType(BaseType):
     oid = 1266
+    array_oid = 1270
     # klass = datetime.time
     fmt = '!q'
 
     @classmethod
     def parse(cls, value, size, tzinfo):
-        time_us = struct.unpack(cls.fmt, value[:size])[0]
+        time_us = cls._struct.unpack(value[:size])[0]
         val, microsecond = divmod(time_us, 1000000)
         val, second = divmod(val, 60)
         hour, minute = divmod(val, 60)
@@ -424,72 +959,89 @@ class TimeTzType(BaseType):
     @classmethod
     def format(cls, value):
         val = ((value.hour * 60 + value.minute) * 60 + value.second) * 1000000 + value.microsecond
-        return (cls.oid, struct.pack(cls.fmt, val), cls.size)
+        return (cls.oid, cls._struct.pack(val), cls.size)
 
 
 class NumericType(BaseType):
+    '''
+    Arbitrary precision number, sent as base 10000 digits with a weight (the
+    exponent of the first digit), sign, and display scale.
+    '''
     oid = 1700
+    array_oid = 1231
     klass = Decimal
 
-    @staticmethod
-    def parse(value, size, tzinfo):
-        hsize = struct.calcsize('!HhHH')
-        ndigits, weight, sign, dscale = struct.unpack('!HhHH', value[:hsize])
-        if sign == 0xc000:
+    header = struct.Struct('!HhHH')
+
+    POS = 0x0000
+    NEG = 0x4000
+    NAN = 0xC000
+    PINF = 0xD000
+    NINF = 0xF000
+
+    @classmethod
+    def parse(cls, value, size, tzinfo):
+        value = value[:size]
+        ndigits, weight, sign, dscale = cls.header.unpack_from(value)
+        if sign == cls.NAN:
             return Decimal('NaN')
-        desc = '!%dH' % ndigits
-        digits = struct.unpack(desc, value[hsize:hsize+struct.calcsize(desc)])
-
-        def source(digits):
-            '''
-            A generator to yield the digits from the Digits, and then an
-            infinite stream of '0's.
-            '''
-            for d in digits:
-                dd = '{:04d}'.format(d)
-                yield from dd
-            yield from repeat('0')
-
-        src = source(digits)
-
-        n = '-' if sign else ''
-        # numeric has a form of compression where if the remaining digits are 0
-        # they are not sent, even if we haven't reached the decimal point yet!
-        for _ in range((weight+1) * 4):
-            n = n + next(src)
-        if dscale:
-            n += '.'
-            for _ in range(dscale):
-                n = n + next(src)
-        n = Decimal(n)
-        return n
+        if sign == cls.PINF:
+            return Decimal('Infinity')
+        if sign == cls.NINF:
+            return Decimal('-Infinity')
+        if not ndigits:
+            return Decimal('0E-%d' % dscale)
+        digits = ('%04d' * ndigits) % struct.unpack_from('!%dH' % ndigits, value, 8)
+        # Each digit after the first is 4 decimal places further down, but
+        # trailing zero digits are not sent, and the last digit may have more
+        # decimal places than the display scale.
+        exponent = (weight - ndigits + 1) * 4
+        if exponent < -dscale:
+            digits = digits[:dscale + exponent]
+        elif exponent > -dscale:
+            digits += '0' * (exponent + dscale)
+        return Decimal('%s%sE-%d' % ('-' if sign == cls.NEG else '', digits, dscale))
 
     @classmethod
     def format(cls, value):
-        sign, digits, exponent = value.as_tuple()
-        dscale = abs(exponent)
-        if exponent:
-            frac = digits[exponent:]
-            digits = digits[:exponent]
-        else:
-            frac = []
-        vals = []
-        while digits:
-            vals.append(int(''.join(map(str, digits[:4]))))
-            digits = digits[4:]
-        weight = len(vals)
-        while frac:
-            d = (frac[:4] + ('0',) * 4)[:4]
-            frac = frac[4:]
-            vals.append(int(''.join(map(str, d))))
-        fmt = '!HhHH%dH' % len(vals)
-        size = struct.calcsize(fmt)
-        val = struct.pack(fmt, len(vals), max(0, weight-1), 0x4000 if sign else 0, dscale, *vals)
+        if not isinstance(value, Decimal):
+            # As when COPYing ints and floats into numeric columns
+            value = Decimal(value if isinstance(value, int) else str(value))
+        if not value.is_finite():
+            if value.is_nan():
+                sign = cls.NAN
+            else:
+                sign = cls.NINF if value.is_signed() else cls.PINF
+            return (cls.oid, cls.header.pack(0, 0, sign, 0), cls.header.size)
+
+        text = '{:f}'.format(value)
+        sign = cls.NEG if text[0] == '-' else cls.POS
+        whole, _, frac = text.lstrip('-').partition('.')
+        whole = whole.lstrip('0')
+        dscale = len(frac)
+        # Pad the digits out to whole base 10000 digits either side of the
+        # decimal point.
+        digits = '0' * (-len(whole) % 4) + whole + frac + '0' * (-dscale % 4)
+        weight = (len(whole) + 3) // 4 - 1
+
+        vals = [int(digits[idx:idx + 4]) for idx in range(0, len(digits), 4)]
+        while vals and not vals[-1]:
+            vals.pop()
+        if not whole:
+            while vals and not vals[0]:
+                vals.pop(0)
+                weight -= 1
+        if not vals:
+            sign = cls.POS
+            weight = 0
+        size = cls.header.size + 2 * len(vals)
+        val = struct.pack('!HhHH%dH' % len(vals), len(vals), weight, sign, dscale, *vals)
         return (cls.oid, val, size)
 
 
 class UUIDType(BaseType):
     oid = 2950
+    array_oid = 2951
     klass = uuid.UUID
 
     @staticmethod
@@ -501,14 +1053,420 @@ class UUIDType(BaseType):
         return (cls.oid, value.bytes, 16)
 
 
-class JsonbType(BaseType):
-    oid = 3802
+class RecordType(BaseType):
+    '''
+    Anonymous records, such as ROW(...), as tuples.
+
+    Each field is sent with its type OID, which is looked up in registry, if
+    set, so fields may be of types which are not built in. Named composite
+    types are subclasses giving the field_types, and a namedtuple row_class to
+    return.
+
+    A composite type made from the registry's pg_type rows also gives its
+    type_oid and field_oids, and asks for the type to be looked up again if
+    a value's fields do not match them, as the type has been altered since.
+    '''
+    oid = 2249
+
+    field_types = None
+    row_class = tuple
+    # The TypeRegistry of the database the records come from
+    registry = None
+    type_oid = None
+    field_oids = None
+
+    @classmethod
+    def parse(cls, value, size, tzinfo):
+        value = value[:size]
+        unpack_from = struct.unpack_from
+        nfields = unpack_from('!i', value)[0]
+        field_types = cls.field_types
+        field_oids = cls.field_oids
+        if field_oids is not None and nfields != len(field_oids):
+            raise TypeLookupNeeded(cls.type_oid)
+        offs = 4
+        fields = []
+        for idx in range(nfields):
+            field_type, field_size = unpack_from('!Ii', value, offs)
+            offs += 8
+            if field_oids is not None and field_type != field_oids[idx]:
+                raise TypeLookupNeeded(cls.type_oid)
+            if field_size == -1:
+                fields.append(None)
+                continue
+            if field_types is not None:
+                kind = field_types[idx]
+            elif cls.registry is not None:
+                kind = cls.registry.get(field_type)
+                if kind is None:
+                    raise TypeLookupNeeded(field_type)
+            else:
+                try:
+                    kind = infer_parser(field_type)
+                except KeyError:
+                    raise TypeError('Unknown type for record field %d: %r' % (idx, field_type))
+            fields.append(kind.parse(value[offs:offs+field_size], field_size, tzinfo))
+            offs += field_size
+        return cls.row_class(fields) if cls.row_class is tuple else cls.row_class(*fields)
+
+    @classmethod
+    def composite(cls, name, names, field_types, type_oid=None, field_oids=None):
+        '''
+        Make the type for a named composite type with the given fields.
+
+        If type_oid and field_oids are given, values are checked against them.
+        '''
+        if not name.isidentifier():
+            name = 'Row'
+        return type(name, (cls,), {
+            # Not registered: the OID varies between databases
+            'oid': None,
+            'field_types': tuple(field_types),
+            'row_class': namedtuple(name, names, rename=True),
+            'type_oid': type_oid,
+            'field_oids': tuple(field_oids) if field_oids is not None else None,
+        })
+
+
+class RecordArrayType(ArrayType):
+    oid = 2287
+
+
+class Range(object):
+    '''
+    A range of values, as returned for postgres range types.
+
+    A bound of None is unbounded. bounds gives whether the lower and upper
+    bounds are inclusive, '[' and ']', or exclusive, '(' and ')'.
+    '''
+    __slots__ = ('lower', 'upper', 'bounds', 'empty')
+
+    def __init__(self, lower=None, upper=None, bounds='[)', empty=False):
+        if bounds not in ('[)', '(]', '()', '[]'):
+            raise ValueError('Invalid range bounds: %r' % (bounds,))
+        self.lower = lower
+        self.upper = upper
+        self.bounds = bounds
+        self.empty = empty
+
+    @property
+    def lower_inc(self):
+        return self.lower is not None and self.bounds[0] == '['
+
+    @property
+    def upper_inc(self):
+        return self.upper is not None and self.bounds[1] == ']'
+
+    def _key(self):
+        if self.empty:
+            return (True,)
+        return (False, self.lower, self.upper, self.lower_inc, self.upper_inc)
+
+    def __eq__(self, other):
+        if not isinstance(other, Range):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __repr__(self):
+        if self.empty:
+            return 'Range(empty=True)'
+        return 'Range(%r, %r, %r)' % (self.lower, self.upper, self.bounds)
+
+    def __str__(self):
+        # The text input form, used when no binary range type fits
+        if self.empty:
+            return 'empty'
+        return '%s%s,%s%s' % (
+            '[' if self.lower_inc else '(',
+            '' if self.lower is None else quote_element(self.lower),
+            '' if self.upper is None else quote_element(self.upper),
+            ']' if self.upper_inc else ')',
+        )
+
+
+class RangeType(BaseType):
+    '''
+    Ranges, as Range values, of the element type of each subclass.
+
+    Parameters are sent as the range type of their bounds: int4range, or
+    int8range if either bound needs it, numrange, daterange, or tstzrange for
+    datetimes whether or not they are naive, as for single datetimes. Declare
+    another with Cursor.setinputsizes. Empty ranges, and those of other
+    types, are sent as text.
+    '''
+    EMPTY = 0x01
+    LB_INC = 0x02
+    UB_INC = 0x04
+    LB_INF = 0x08
+    UB_INF = 0x10
+
+    element = None
+
+    @classmethod
+    def parse(cls, value, size, tzinfo):
+        value = value[:size]
+        flags = value[0]
+        if flags & cls.EMPTY:
+            return Range(empty=True)
+        unpack_from = struct.unpack_from
+        parse = cls.element.parse
+        offs = 1
+        lower = upper = None
+        if not flags & cls.LB_INF:
+            bound_size = unpack_from('!i', value, offs)[0]
+            offs += 4
+            lower = parse(value[offs:offs+bound_size], bound_size, tzinfo)
+            offs += bound_size
+        if not flags & cls.UB_INF:
+            bound_size = unpack_from('!i', value, offs)[0]
+            offs += 4
+            upper = parse(value[offs:offs+bound_size], bound_size, tzinfo)
+        return Range(
+            lower, upper,
+            ('[' if flags & cls.LB_INC else '(') + (']' if flags & cls.UB_INC else ')'),
+        )
+
+    @classmethod
+    def format(cls, value):
+        # Raises KeyError if there is no range type for the bounds, leaving
+        # format_type to send the range as text.
+        kind = cls if cls.element is not None else cls.range_type([value])
+        if value.empty:
+            data = bytes([cls.EMPTY])
+            return (kind.oid, data, 1)
+        encode = kind.element.encode
+        pack_length = struct.Struct('!i').pack
+        flags = 0
+        data = [b'']
+        if value.lower is None:
+            flags |= cls.LB_INF
+        else:
+            if value.lower_inc:
+                flags |= cls.LB_INC
+            bound = encode(value.lower)
+            data += [pack_length(len(bound)), bound]
+        if value.upper is None:
+            flags |= cls.UB_INF
+        else:
+            if value.upper_inc:
+                flags |= cls.UB_INC
+            bound = encode(value.upper)
+            data += [pack_length(len(bound)), bound]
+        data[0] = bytes([flags])
+        data = b''.join(data)
+        return (kind.oid, data, len(data))
 
     @staticmethod
-    def parse(value, size, tzinfo):
-        if value[0] == b'\x01':
-            return json.loads(value[1:size].decode('utf-8'))
-        return value[1:size].decode('utf-8')
+    def range_type(values):
+        '''
+        Choose the range type to send some Range values as.
+
+        Raises KeyError if they are all empty, or their bounds are not all of
+        one type.
+        '''
+        bounds = [
+            bound
+            for value in values
+            if not value.empty
+            for bound in (value.lower, value.upper)
+            if bound is not None
+        ]
+        klasses = set(map(type, bounds))
+        if len(klasses) != 1:
+            raise KeyError(klasses)
+        klass = klasses.pop()
+        if klass is int:
+            if max(bound.bit_length() for bound in bounds) < 32:
+                return Int4RangeType
+            return Int8RangeType
+        return RANGE_TYPES[klass]
+
+
+class Int4RangeType(RangeType):
+    oid = 3904
+    array_oid = 3905
+    element = IntType
+
+
+class NumRangeType(RangeType):
+    oid = 3906
+    array_oid = 3907
+    element = NumericType
+
+
+class TsRangeType(RangeType):
+    oid = 3908
+    array_oid = 3909
+    element = TimestampType
+
+
+class TstzRangeType(RangeType):
+    oid = 3910
+    array_oid = 3911
+    element = TimestampTzType
+
+
+class DateRangeType(RangeType):
+    oid = 3912
+    array_oid = 3913
+    element = DateType
+
+
+class Int8RangeType(RangeType):
+    oid = 3926
+    array_oid = 3927
+    element = LongType
+
+
+# The range types to send Ranges as, by the type of their bounds
+RANGE_TYPES = {
+    Decimal: NumRangeType,
+    datetime.date: DateRangeType,
+    datetime.datetime: TstzRangeType,
+}
+
+BaseType._type[Range] = RangeType
+
+
+class JsonProxy(object):
+    '''
+    A json value which is only parsed when it is used.
+
+    The raw text is kept, so it can be passed back as a parameter without
+    being parsed or serialised again.
+    '''
+    __slots__ = ('raw', '_loads', '_value')
+
+    def __init__(self, raw, loads=json.loads):
+        self.raw = raw
+        self._loads = loads
+        self._value = None
+
+    @property
+    def value(self):
+        if self._loads is not None:
+            self._value = self._loads(self.raw)
+            self._loads = None
+        return self._value
+
+    def __getattr__(self, name):
+        # Private names are never forwarded, as copying and unpickling look
+        # them up before the slots are set
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.value, name)
+
+    def __reduce__(self):
+        if self._loads is not None:
+            return (JsonProxy, (bytes(self.raw), self._loads))
+        return (JsonProxy, (bytes(self.raw), None), (None, {'_value': self._value}))
+
+    def __getitem__(self, key):
+        return self.value[key]
+
+    def __iter__(self):
+        return iter(self.value)
+
+    def __len__(self):
+        return len(self.value)
+
+    def __contains__(self, item):
+        return item in self.value
+
+    def __bool__(self):
+        return bool(self.value)
+
+    def __eq__(self, other):
+        if isinstance(other, JsonProxy):
+            other = other.value
+        return self.value == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return 'JsonProxy(%r)' % (self.raw,)
+
+
+class JsonType(BaseType):
+    '''
+    json values, parsed with loads and serialised with dumps.
+
+    These may be replaced by a faster implementation, such as orjson's, on
+    this class or on JsonbType alone. loads is passed bytes, and dumps may
+    return str or bytes.
+
+    If lazy is set, values are returned as JsonProxy, and only parsed when
+    they are used.
+    '''
+    oid = 114
+    array_oid = 199
+
+    loads = staticmethod(json.loads)
+    dumps = staticmethod(json.dumps)
+    lazy = False
+
+    @classmethod
+    def parse(cls, value, size, tzinfo):
+        return cls.load(value[:size])
+
+    @classmethod
+    def load(cls, data):
+        if cls.lazy:
+            return JsonProxy(data, cls.loads)
+        return cls.loads(data)
+
+    @classmethod
+    def dump(cls, value):
+        if isinstance(value, JsonProxy):
+            return value.raw
+        data = cls.dumps(value)
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        return data
+
+    @classmethod
+    def format(cls, value):
+        data = cls.dump(value)
+        return (cls.oid, data, len(data))
+
+
+class JsonbType(JsonType):
+    '''
+    jsonb values, which are json text after a version number.
+
+    dicts are sent as jsonb. Lists are sent as arrays, unless JsonbType is
+    declared for them with Cursor.setinputsizes.
+    '''
+    oid = 3802
+    array_oid = 3807
+    klass = dict
+
+    VERSION = b'\x01'
+
+    @classmethod
+    def parse(cls, value, size, tzinfo):
+        value = value[:size]
+        if value[:1] != cls.VERSION:
+            raise ValueError('Unsupported jsonb version: %r' % (value[:1],))
+        return cls.load(value[1:])
+
+    @classmethod
+    def format(cls, value):
+        data = cls.VERSION + cls.dump(value)
+        return (cls.oid, data, len(data))
+
+
+BaseType._type[JsonProxy] = JsonbType
+
+
+# The element types of the built in array types
+for _kind in list(BaseType._oid.values()):
+    if _kind.array_oid in BaseType._oid:
+        BaseType._oid[_kind.array_oid].element_oid = _kind.oid
+del _kind
 
 
 # This type object is used to describe columns in a database that are
@@ -1,11 +1,26 @@
 import logging
 
+from ctypes import addressof, byref, c_char, c_void_p, string_at
+
 from . import libpq
-from .exceptions import DatabaseError
+from .exceptions import DatabaseError, OperationalError
 
 log = logging.getLogger(__name__)
 
 
+class ResultBuffer:
+    '''
+    Owns a PGresult once memoryviews of its values have been handed out, so
+    it is only freed when the Result has been cleared and every view has been
+    released.
+    '''
+    def __init__(self, result):
+        self._result = result
+
+    def __del__(self):
+        libpq.PQclear(self._result)
+
+
 class Result:
     PGRES_EMPTY_QUERY = 0       # empty query string was executed
     PGRES_COMMAND_OK = 1        # a query command that doesn't return anything was
@@ -21,10 +36,15 @@ class Result:
     PGRES_FATAL_ERROR = 7       # query failed
     PGRES_COPY_BOTH = 8         # Copy In/Out data transfer in progress
     PGRES_SINGLE_TUPLE = 9      # single tuple from larger resultset
+    PGRES_PIPELINE_SYNC = 10    # pipeline synchronization point
+    PGRES_PIPELINE_ABORTED = 11 # Command didn't run because of an abort
+                                # earlier in a pipeline
+    PGRES_TUPLES_CHUNK = 12     # chunk of tuples from larger resultset
 
     def __init__(self, result, connection):
         self._result = result
         self._conn = connection
+        self._owner = None
 
     def status(self):
         return libpq.PQresultStatus(self._result)
@@ -44,7 +64,10 @@ class Result:
         return msg.decode('utf-8') if msg else msg
 
     def clear(self):
-        if self._result:
+        if self._owner is not None:
+            # Freed when the last view of it is released
+            self._owner = None
+        elif self._result:
             libpq.PQclear(self._result)
         self._result = None
 
@@ -79,16 +102,70 @@ class Result:
     def get_value(self, row, field):
         return libpq.PQgetvalue(self._result, row, field)
 
+    def get_view(self, row, field):
+        '''
+        Return a read only memoryview of a value, without copying it.
+
+        The result is kept until the view, and any slice of it, is released.
+        '''
+        if self._owner is None:
+            self._owner = ResultBuffer(self._result)
+        size = libpq.PQgetlength(self._result, row, field)
+        value = libpq.PQgetvalue(self._result, row, field)
+        buf = (c_char * size).from_address(addressof(value.contents))
+        buf.owner = self._owner
+        return memoryview(buf).cast('B').toreadonly()
+
     def get_length(self, row, field):
         return libpq.PQgetlength(self._result, row, field)
 
     def get_isnull(self, row, field):
         return libpq.PQgetisnull(self._result, row, field)
 
+    def get_column(self, field, start, stop, size=-1):
+        '''
+        Return the raw bytes of a column for rows [start, stop), with None for
+        NULLs.
+
+        If size is given, the column is known to be fixed width and the length
+        lookup is skipped.
+
+        Slicing the POINTER(c_char) libpq returns copies the value with a
+        single memcpy, and is quicker than string_at.
+        '''
+        result = self._result
+        getvalue = libpq.PQgetvalue
+        getlength = libpq.PQgetlength
+        getisnull = libpq.PQgetisnull
+        values = []
+        append = values.append
+        for row in range(start, stop):
+            if getisnull(result, row, field):
+                append(None)
+            elif size > 0:
+                append(getvalue(result, row, field)[:size])
+            else:
+                append(getvalue(result, row, field)[:getlength(result, row, field)])
+        return values
+
+    def get_views(self, field, start, stop):
+        '''
+        As get_column, but returning memoryviews as get_view does.
+        '''
+        result = self._result
+        getisnull = libpq.PQgetisnull
+        get_view = self.get_view
+        return [
+            None if getisnull(result, row, field) else get_view(row, field)
+            for row in range(start, stop)
+        ]
+
     def check_cmd_result(self):
         status = self.status()
         if status in (libpq.PGRES_COMMAND_OK, libpq.PGRES_TUPLES_OK):
             return None
+        if status in libpq.STREAM_STATUSES:
+            return None
 
         msg = self.error_message()
         if status == libpq.PGRES_NONFATAL_ERROR:
@@ -146,7 +223,8 @@ class PGConnection:
         return libpq.PQstatus(self._conn)
 
     def db(self):
-        return libpq.PQdb(self._conn)
+        value = libpq.PQdb(self._conn)
+        return value.decode('utf-8') if value else value
 
     def user(self):
         return libpq.PQuser(self._conn)
@@ -155,10 +233,12 @@ class PGConnection:
         return libpq.PQpass(self._conn)
 
     def host(self):
-        return libpq.PQhost(self._conn)
+        value = libpq.PQhost(self._conn)
+        return value.decode('utf-8') if value else value
 
     def port(self):
-        return libpq.PQport(self._conn)
+        value = libpq.PQport(self._conn)
+        return value.decode('utf-8') if value else value
 
     def tty(self):
         return libpq.PQtty(self._conn)
@@ -192,6 +272,103 @@ class PGConnection:
         result = libpq.PQexecParams(self._conn, *args)
         return Result(result, self)
 
+    def send_query_params(self, *args):
+        return libpq.PQsendQueryParams(self._conn, *args)
+
+    def send_query_prepared(self, name, *args):
+        return libpq.PQsendQueryPrepared(self._conn, name.encode('utf-8'), *args)
+
+    def socket(self):
+        return libpq.PQsocket(self._conn)
+
+    def set_nonblocking(self, arg):
+        return libpq.PQsetnonblocking(self._conn, arg)
+
+    def flush(self):
+        return libpq.PQflush(self._conn)
+
+    def consume_input(self):
+        return libpq.PQconsumeInput(self._conn)
+
+    def set_single_row_mode(self):
+        return libpq.PQsetSingleRowMode(self._conn)
+
+    def set_chunked_rows_mode(self, size):
+        return libpq.PQsetChunkedRowsMode(self._conn, size)
+
+    def get_result(self):
+        result = libpq.PQgetResult(self._conn)
+        if not result:
+            return None
+        return Result(result, self)
+
+    def drain(self):
+        '''
+        Discard any results still pending for the last query sent.
+
+        An unfinished COPY TO is read to its end, and a COPY FROM is aborted.
+        '''
+        while True:
+            result = libpq.PQgetResult(self._conn)
+            if not result:
+                break
+            status = libpq.PQresultStatus(result)
+            libpq.PQclear(result)
+            if status == libpq.PGRES_COPY_OUT:
+                try:
+                    while self.get_copy_data() is not None:
+                        pass
+                except OperationalError:
+                    pass
+            elif status == libpq.PGRES_COPY_IN:
+                self.put_copy_end('COPY abandoned')
+
+    def get_copy_data(self):
+        '''
+        Return the next chunk of data from a COPY TO, or None at its end.
+        '''
+        buf = c_void_p()
+        size = libpq.PQgetCopyData(self._conn, byref(buf), 0)
+        if size == -1:
+            return None
+        if size == -2:
+            raise OperationalError(self.error_message())
+        try:
+            return string_at(buf, size)
+        finally:
+            libpq.PQfreemem(buf)
+
+    def enter_pipeline_mode(self):
+        return libpq.PQenterPipelineMode(self._conn)
+
+    def exit_pipeline_mode(self):
+        return libpq.PQexitPipelineMode(self._conn)
+
+    def pipeline_sync(self):
+        return libpq.PQpipelineSync(self._conn)
+
+    def put_copy_data(self, data):
+        return libpq.PQputCopyData(self._conn, data, len(data))
+
+    def put_copy_end(self, errormsg=None):
+        if errormsg is not None:
+            errormsg = errormsg.encode('utf-8')
+        return libpq.PQputCopyEnd(self._conn, errormsg)
+
+    def describe_prepared(self, name):
+        result = libpq.PQdescribePrepared(self._conn, name.encode('utf-8'))
+        return Result(result, self)
+
+    def describe_portal(self, name):
+        result = libpq.PQdescribePortal(self._conn, name.encode('utf-8'))
+        return Result(result, self)
+
     def prepare(self, name, query, nparams, param_types):
-        result = libpq.PQprepare(name.encode('utf-8'), query.encode('utf-8'), nparams, param_types)
+        if isinstance(query, str):
+            query = query.encode('utf-8')
+        result = libpq.PQprepare(self._conn, name.encode('utf-8'), query, nparams, param_types)
+        return Result(result, self)
+
+    def exec_prepared(self, name, *args):
+        result = libpq.PQexecPrepared(self._conn, name.encode('utf-8'), *args)
         return Result(result, self)